@@ -1,119 +1,33 @@
 import streamlit as st
 import pandas as pd
 import os
-import glob
-import re
-import requests
-import base64
-from bs4 import BeautifulSoup
+from fanta.nomi import nome_voti, carica_alias
+from fanta.lettura import leggi_excel_intelligente
+from fanta.voti import elenca_file_voti
+from fanta.asset import trova_immagine, trova_logo_fanta, verifica_asset, immagine_ridotta
+from fanta.database import leggi_database, compatta_database, rapporto_memoria
+from fanta.ingestione import ricostruisci_rose, ricostruisci_voti, carica_giornata, aggiorna_formazioni
+from fanta.calendario import carica_calendario, partite_giornata, prossima_partita
+from fanta.percorsi import percorsi, elenca_stagioni, elenca_leghe, crea_lega
+from fanta.storico import storico_giocatore, leggi_storico, migra_storico_csv
+from fanta.render import html_partite, tabella_classifica, stile_classifica
+from fanta.forma import leggi_vista, forma_giocatori, rosa_voti, aggiorna_totali_squadre
+from fanta.ottimizzatore import ottimizza_formazioni, punteggio_proiezione, punteggio_forma
+from fanta.simulazione import simula_stagione, squadre_calendario
+from fanta.regole import leggi_regole, salva_regola, fanta_medie, fantavoti_storico, EVENTI, NOMI_EVENTI, REGOLA_STANDARD, PESI_STANDARD
+from fanta.profilo import inizia_rerun, chiudi_rerun, fase, registra_cache, cache_mancata
+from fanta.persistenza import percorso_atomico, firma_dati
 
 # --- CONFIGURAZIONE ---
 st.set_page_config(page_title="Fanta-Manager 2026", layout="wide")
 
-FILE_DATABASE = 'fanta_database.csv'
-FILE_HISTORY = 'fanta_history.csv'
-FILE_ROSE_IMPORT = 'Rose_fantawotblitz.xlsx' 
-FILE_CLASSIFICA = 'Classifica_Campionato.xlsx'
-FILE_CALENDARIO = 'Calendario_Campionato.xlsx'
-DIR_VOTI = 'Voti'
-DIR_IMG = 'img'
-DIR_LOGO = 'logo'
-
-# --- MAPPA SIGLE EXCEL -> NOMI FILE ---
-MAPPA_SERIE_A = {
-    'Int': 'inter', 'Mil': 'milan', 'Juv': 'juventus', 'Nap': 'napoli', 'Rom': 'roma',
-    'Laz': 'lazio', 'Ata': 'atalanta', 'Fio': 'fiorentina', 'Bol': 'bologna', 'Tor': 'torino',
-    'Udi': 'udinese', 'Gen': 'genoa', 'Ver': 'verona', 'Lec': 'lecce', 'Emp': 'empoli',
-    'Mon': 'monza', 'Cag': 'cagliari', 'Sal': 'salernitana', 'Sas': 'sassuolo', 'Fro': 'frosinone',
-    'Par': 'parma', 'Com': 'como', 'Ven': 'venezia', 'Cre': 'cremonese', 'Spe': 'spezia',
-    'Pis': 'pisa', 'Bar': 'bari', 'Sam': 'sampdoria'
-}
-
 # --- 1. FUNZIONI DI UTILITÀ ---
-
-def img_to_base64(path):
-    if not path or not os.path.exists(path): return None
-    try:
-        with open(path, "rb") as f:
-            data = f.read()
-        encoded = base64.b64encode(data).decode()
-        return f"data:image/png;base64,{encoded}"
-    except: return None
-
-def normalizza_nome(nome):
-    if pd.isna(nome): return ""
-    return str(nome).lower().strip().replace(".", "").replace("'", "")
-
-def normalizza_per_confronto_web(nome):
-    if pd.isna(nome): return ""
-    n = str(nome).lower().strip().replace(".", "").replace("'", "")
-    parole = n.split()
-    return parole[-1] if len(parole) > 0 else n
-
-def trova_immagine(nome_giocatore):
-    if not os.path.exists(DIR_IMG): return None
-    files = os.listdir(DIR_IMG)
-    nome_clean = normalizza_nome(nome_giocatore)
-    for f in files:
-        if normalizza_nome(f.split('.')[0]) == nome_clean: return os.path.join(DIR_IMG, f)
-    parole_nome = nome_clean.split()
-    for f in files:
-        if any(p in normalizza_nome(f.split('.')[0]) for p in parole_nome if len(p) > 3): 
-            return os.path.join(DIR_IMG, f)
-    return None
-
-def trova_logo_fanta(nome_squadra):
-    if not os.path.exists(DIR_LOGO): return None
-    files = os.listdir(DIR_LOGO)
-    if pd.isna(nome_squadra): return None
-    nome_clean = normalizza_nome(nome_squadra)
-    for f in files:
-        if normalizza_nome(f.split('.')[0]) == nome_clean: return os.path.join(DIR_LOGO, f)
-    for f in files:
-        if nome_clean in normalizza_nome(f.split('.')[0]): return os.path.join(DIR_LOGO, f)
-    return None
-
-def trova_logo_seriea(sigla_excel):
-    if not os.path.exists(DIR_LOGO): return None
-    if pd.isna(sigla_excel): return None
-    chiave = str(sigla_excel).capitalize()
-    nome_target = MAPPA_SERIE_A.get(chiave, str(sigla_excel).lower())
-    files = os.listdir(DIR_LOGO)
-    for f in files:
-        if f.lower().startswith(nome_target.lower() + "."):
-            return os.path.join(DIR_LOGO, f)
-    return None
-
-def estrai_numero_giornata(filepath):
-    nome_file = os.path.basename(filepath)
-    match = re.search(r'Giornata_(\d+)', nome_file)
-    if match: return int(match.group(1))
-    return 0
-
-def check_database_integrity(df):
-    cols_float = ['Media_Voto', 'Fanta_Media']
-    cols_int = ['Gol_Totali', 'Gol_Subiti', 'Partite_Giocate', 'Assist', 
-                'Ammonizioni', 'Espulsioni', 'Rigori_Segnati', 'Rigori_Sbagliati', 
-                'Rigori_Parati', 'Autoreti']
-    if 'Status_Probabile' not in df.columns: df['Status_Probabile'] = '?'
-    if df.empty: return df
-    
-    if 'Squadra_SerieA' in df.columns:
-        df['Path_Logo'] = df['Squadra_SerieA'].apply(trova_logo_seriea)
-        df['Logo_SerieA'] = df['Path_Logo'].apply(img_to_base64)
-
-    for col in cols_float:
-        if col not in df.columns: df[col] = 0.0
-    for col in cols_int:
-        if col not in df.columns: df[col] = 0
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
-    return df
-
 
 def salva_file_caricato(uploaded_file, destinazione):
     try:
-        with open(destinazione, 'wb') as f:
-            f.write(uploaded_file.getbuffer())
+        with percorso_atomico(destinazione, versiona=True) as temporaneo:
+            with open(temporaneo, 'wb') as f:
+                f.write(uploaded_file.getbuffer())
         return True
     except Exception as e:
         st.error(f"Impossibile salvare {uploaded_file.name}: {e}")
@@ -126,83 +40,6 @@ def get_role_color(ruolo):
 def applica_stile_ruoli(val):
     return f'color: {get_role_color(val)}; font-weight: bold'
 
-# --- SCRAPING ---
-@st.cache_data(ttl=3600)
-def scarica_probabili_formazioni():
-    url = "https://www.gazzetta.it/Calcio/prob_form/"
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            full_text = soup.get_text().lower()
-            bad_words = ["indisponibili", "squalificati", "ballottaggi", "panchina", "diffidati", "disposizione in campo"]
-            for word in bad_words:
-                full_text = re.sub(rf"{word}.*?(\.|\n|$)", "", full_text, flags=re.DOTALL)
-            return full_text
-    except: pass
-    return ""
-
-def verifica_titolare(nome, text):
-    if not text: return "⚪"
-    cog = normalizza_per_confronto_web(nome)
-    if len(cog) < 3: return "⚪"
-    return "🟢" if cog in text else "⚪"
-
-# --- LETTURA FILE ---
-def leggi_excel_intelligente(filepath):
-    try:
-        if filepath.endswith('.csv'):
-            df_preview = pd.read_csv(filepath, header=None, nrows=10, encoding='latin1', sep=None, engine='python')
-        else:
-            df_preview = pd.read_excel(filepath, header=None, nrows=10)
-        header_row_idx = -1
-        for idx, row in df_preview.iterrows():
-            row_str = row.astype(str).str.lower().tolist()
-            if any(x in row_str for x in ['calciatore', 'nome', 'pos', 'squadra']):
-                header_row_idx = idx
-                break
-        if filepath.endswith('.csv'):
-            if header_row_idx != -1: return pd.read_csv(filepath, header=header_row_idx, encoding='latin1', sep=None, engine='python')
-            else: return pd.read_csv(filepath, encoding='latin1', sep=None, engine='python')
-        else:
-            if header_row_idx != -1: return pd.read_excel(filepath, header=header_row_idx)
-            else: return pd.read_excel(filepath)
-    except Exception: return None
-
-# --- PARSER CALENDARIO ---
-def parse_calendario_complesso(filepath):
-    try:
-        if filepath.endswith('.csv'):
-            df = pd.read_csv(filepath, header=None, encoding='latin1', sep=None, engine='python')
-        else:
-            df = pd.read_excel(filepath, header=None)
-        matches = []
-        rows, cols = df.shape
-        for r in range(rows):
-            for c in range(cols):
-                cell_val = str(df.iat[r, c]).lower()
-                if "giornata lega" in cell_val:
-                    try:
-                        g_lega = int(re.search(r'(\d+)', cell_val).group(1))
-                        g_seriea = "?"
-                        if c+2 < cols:
-                            s_str = str(df.iat[r, c+2]).lower()
-                            if "serie a" in s_str: found = re.search(r'(\d+)', s_str); g_seriea = found.group(1) if found else "?"
-                        curr = r + 1
-                        while curr < rows:
-                            home = df.iat[curr, c]
-                            if pd.isna(home) or "giornata" in str(home).lower(): break
-                            pt_h = df.iat[curr, c+1]
-                            pt_a = df.iat[curr, c+2]
-                            away = df.iat[curr, c+3]
-                            res = df.iat[curr, c+4]
-                            matches.append({'Giornata_Lega': g_lega, 'Giornata_SerieA': g_seriea, 'Casa': home, 'Punti_Casa': pt_h, 'Punti_Trasferta': pt_a, 'Trasferta': away, 'Risultato': res})
-                            curr += 1
-                    except: continue
-        return pd.DataFrame(matches).sort_values('Giornata_Lega') if matches else None
-    except: return None
-
 def get_table_config():
     # CONFIGURAZIONE IBRIDA: BARRE PER I VOTI, NUMERI PER IL RESTO
     return {
@@ -220,242 +57,315 @@ def get_table_config():
         "Pos": st.column_config.NumberColumn("Rank", format="#%d"),
         "Status_Probabile": st.column_config.TextColumn("News", width="small"),
         "Logo_SerieA": st.column_config.ImageColumn("Club", width="small"),
-        "Costo": st.column_config.NumberColumn("Costo", format="%d")
+        "Costo": st.column_config.NumberColumn("Costo", format="%d"),
+        "Forma": st.column_config.NumberColumn("Forma", format="%.2f", help="FantaMedia delle ultime 5 presenze"),
+        "Delta_Forma": st.column_config.NumberColumn("Δ Forma", format="%+.2f", help="Forma meno FantaMedia stagionale"),
+        "Serie_Presenze": st.column_config.NumberColumn("Serie", format="%d", help="Giornate consecutive con voto")
     }
 
-# --- 2. IMPORTA ROSE ---
-def importa_rose(filepath):
-    try:
-        df = leggi_excel_intelligente(filepath)
-        if df is None: return None
-        if 'Ruolo' not in df.columns: df = pd.read_excel(filepath, header=None)
-        players = []
-        for col in range(len(df.columns)):
-            rows = df.index[df[col].astype(str) == 'Ruolo'].tolist()
-            for r in rows:
-                team = df.iloc[r-1, col]
-                if pd.isna(team): continue
-                curr = r + 1
-                while curr < len(df):
-                    ruolo = df.iloc[curr, col]
-                    nome = df.iloc[curr, col+1]
-                    serie_a = df.iloc[curr, col+2]
-                    costo = df.iloc[curr, col+3]
-                    if pd.isna(ruolo) or str(ruolo).startswith("Crediti"): break
-                    if pd.notna(nome):
-                        path_logo = trova_logo_seriea(serie_a)
-                        p = {'Giocatore': nome, 'Ruolo': ruolo, 'Squadra_SerieA': serie_a, 'Path_Logo': path_logo, 'Fanta_Squadra': team, 'Costo': costo, 'Media_Voto': 0.0, 'Fanta_Media': 0.0, 'Partite_Giocate': 0, 'Gol_Totali': 0, 'Gol_Subiti': 0, 'Assist': 0, 'Ammonizioni': 0, 'Espulsioni': 0, 'Rigori_Segnati': 0, 'Rigori_Sbagliati': 0, 'Rigori_Parati': 0, 'Autoreti': 0, 'Status_Probabile': '?'}
-                        players.append(p)
-                    curr += 1
-        return pd.DataFrame(players)
-    except Exception as e:
-        st.error(f"Errore lettura Rose: {e}")
-        return None
-
-# --- 3. ELABORA VOTI ---
-def elabora_storico_voti(df_rose, directory):
-    pattern = os.path.join(directory, "*Giornata*.xlsx")
-    files = glob.glob(pattern)
-    files.sort(key=estrai_numero_giornata)
-    st.info(f"Elaborazione in corso... File trovati: {len(files)}")
-    bar = st.progress(0)
-    all_data = []
-    history_records = []
-    for i, file in enumerate(files):
-        giornata_num = estrai_numero_giornata(file)
-        try:
-            df_day = leggi_excel_intelligente(file)
-            if df_day is None: continue
-            df_day.columns = df_day.columns.astype(str).str.lower().str.strip()
-            cols = df_day.columns
-            c_nome = next((c for c in cols if c in ['nome', 'calciatore', 'nome calciatore']), None)
-            c_voto = next((c for c in cols if c in ['voto', 'v']), None)
-            if not c_nome or not c_voto: continue
-            c_gf = next((c for c in cols if c == 'gf'), None)
-            c_gs = next((c for c in cols if c == 'gs'), None)
-            c_rp = next((c for c in cols if c == 'rp'), None)
-            c_rs = next((c for c in cols if c == 'rs'), None) 
-            c_rf = next((c for c in cols if c == 'rf'), None)
-            c_au = next((c for c in cols if c == 'au'), None)
-            c_amm = next((c for c in cols if c == 'amm'), None)
-            c_esp = next((c for c in cols if c == 'esp'), None)
-            c_ass = next((c for c in cols if c == 'ass'), None)
-            df_day = df_day.dropna(subset=[c_nome])
-            df_day[c_voto] = pd.to_numeric(df_day[c_voto], errors='coerce')
-            validi = df_day[df_day[c_voto] > 0].copy()
-            validi['clean_name'] = validi[c_nome].apply(normalizza_nome)
-            def get_val(df_in, col_name):
-                if col_name: return pd.to_numeric(df_in[col_name], errors='coerce').fillna(0)
-                return 0
-            validi['gf'] = get_val(validi, c_gf)
-            validi['gs'] = get_val(validi, c_gs)
-            validi['rp'] = get_val(validi, c_rp)
-            validi['rs'] = get_val(validi, c_rs) 
-            validi['rf'] = get_val(validi, c_rf) 
-            validi['au'] = get_val(validi, c_au)
-            validi['amm'] = get_val(validi, c_amm)
-            validi['esp'] = get_val(validi, c_esp)
-            validi['ass'] = get_val(validi, c_ass)
-            validi['fantavoto'] = (validi[c_voto] + (validi['gf']*3) + (validi['rf']*3) + (validi['rp']*3) + (validi['ass']*1) - (validi['gs']*1) - (validi['au']*2) - (validi['rs']*3) - (validi['amm']*0.5) - (validi['esp']*1))
-            mini = validi[['clean_name', c_voto, 'fantavoto', 'gf', 'gs', 'rp', 'rs', 'rf', 'au', 'amm', 'esp', 'ass']].rename(columns={c_voto: 'voto'})
-            all_data.append(mini)
-            hist_mini = validi[['clean_name', c_voto, 'fantavoto', 'gf', 'ass', 'amm', 'esp', 'rp', 'rf', 'rs']].copy()
-            hist_mini['Giornata'] = giornata_num
-            hist_mini.rename(columns={c_voto: 'Voto', 'fantavoto': 'Fantavoto', 'gf':'Gol', 'ass':'Assist', 'amm':'Amm', 'esp':'Esp', 'rp':'Rig.Par', 'rf':'Rig.Fatti', 'rs':'Rig.Sba'}, inplace=True)
-            history_records.append(hist_mini)
-        except Exception: pass
-        bar.progress((i + 1) / len(files))
-    if history_records: pd.concat(history_records).to_csv(FILE_HISTORY, index=False)
-    if all_data:
-        big_df = pd.concat(all_data)
-        stats = big_df.groupby('clean_name').sum(numeric_only=True)
-        stats['presenze'] = big_df.groupby('clean_name')['voto'].count()
-        stats['media_voto'] = big_df.groupby('clean_name')['voto'].mean()
-        stats['fanta_media'] = big_df.groupby('clean_name')['fantavoto'].mean()
-        df_rose = check_database_integrity(df_rose)
-        count = 0
-        for idx, row in df_rose.iterrows():
-            nk = normalizza_nome(row['Giocatore'])
-            if nk in stats.index:
-                s = stats.loc[nk]
-                df_rose.at[idx, 'Media_Voto'] = s['media_voto']
-                df_rose.at[idx, 'Fanta_Media'] = s['fanta_media']
-                df_rose.at[idx, 'Partite_Giocate'] = int(s['presenze'])
-                df_rose.at[idx, 'Gol_Totali'] = int(s['gf'])
-                df_rose.at[idx, 'Gol_Subiti'] = int(s['gs'])
-                df_rose.at[idx, 'Assist'] = int(s['ass'])
-                df_rose.at[idx, 'Ammonizioni'] = int(s['amm'])
-                df_rose.at[idx, 'Espulsioni'] = int(s['esp'])
-                df_rose.at[idx, 'Rigori_Segnati'] = int(s['rf']) 
-                df_rose.at[idx, 'Rigori_Sbagliati'] = int(s['rs']) 
-                df_rose.at[idx, 'Rigori_Parati'] = int(s['rp'])
-                df_rose.at[idx, 'Autoreti'] = int(s['au'])
-                count += 1
-        return df_rose
-    return df_rose
+# --- DATI CONDIVISI TRA SESSIONI ---
+# Database, classifica e aggregati sono caricati una volta per versione dei file
+# (contatore dei dati + mtime + dimensione, vedi fanta.persistenza) e condivisi da tutte
+# le sessioni: quando un'azione della sidebar riscrive un file cambia la chiave e la
+# cache si rinnova da sola. Gli oggetti restituiti sono in sola lettura: chi deve
+# modificarli lavora su una copia.
+# Il percorso fa parte della chiave: ogni lega del workspace ha le sue voci.
+# Calendario e storico hanno gia' una cache per versione a livello di modulo (fanta.*).
+def versione_file(path):
+    return firma_dati(path)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def carica_database(path, versione):
+    cache_mancata('database')
+    if versione is None: return pd.DataFrame()
+    return compatta_database(leggi_database(path))
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def aggregati_database(path, versione):
+    cache_mancata('aggregati')
+    registra_cache('database', True)
+    df = carica_database(path, versione)
+    if df.empty: return {}
+    df = df.assign(Malus_Tot=df['Ammonizioni'] + (df['Espulsioni'] * 3))
+    portieri = df[(df['Ruolo']=='P') & (df['Partite_Giocate'] > 4)].sort_values('Gol_Subiti')
+    return {
+        'squadre': sorted(df['Fanta_Squadra'].unique()),
+        'giocatori': sorted(df['Giocatore'].unique()),
+        'stats_squadre': df.groupby('Fanta_Squadra')[['Media_Voto', 'Fanta_Media']].mean().reset_index(),
+        'capocannoniere': df.loc[df['Gol_Totali'].idxmax()],
+        'assist_man': df.loc[df['Assist'].idxmax()],
+        'saracinesca': portieri.iloc[0] if not portieri.empty else df.iloc[0],
+        'cattivo': df.loc[df['Malus_Tot'].idxmax()],
+        'cecchino': df.loc[df['Rigori_Segnati'].idxmax()],
+    }
 
-# --- MAIN EXECUTION ---
-if os.path.exists(FILE_DATABASE):
-    df = pd.read_csv(FILE_DATABASE)
-    df = check_database_integrity(df)
-else:
-    df = pd.DataFrame()
+@st.cache_resource(max_entries=4, show_spinner=False)
+def carica_classifica(path, versione, path_db, versione_db):
+    cache_mancata('classifica')
+    if versione is None: return None
+    df_cl = leggi_excel_intelligente(path)
+    if df_cl is None: return None
+    df_cl = df_cl.loc[:, ~df_cl.columns.str.contains('^Unnamed')]
+    df_cl = df_cl.dropna(how='all', axis=1)
+    col_squadra = next((c for c in df_cl.columns if 'squadra' in c.lower()), None)
+    if col_squadra:
+        registra_cache('aggregati', True)
+        stats_squadre = aggregati_database(path_db, versione_db)['stats_squadre']
+        df_cl = pd.merge(df_cl, stats_squadre, left_on=col_squadra, right_on='Fanta_Squadra', how='left')
+    # Tabella gia' pronta per la vista compatta (loghi in miniatura inclusi)
+    tabella = tabella_classifica(df_cl, col_squadra) if col_squadra else None
+    return df_cl, col_squadra, tabella
+
+def cambia_workspace():
+    # La squadra scelta (e le regole) appartengono alla lega precedente
+    st.session_state.pop('selected_team', None)
+    st.session_state.pop('regola_punteggio', None)
+
+def cambia_stagione():
+    cambia_workspace()
+    st.session_state.pop('lega', None)
+
+# Viste di forma: la vista della stagione e' gia' materializzata (fanta.forma), qui solo
+# l'allineamento al database della lega e i totali per giornata, aggiornati in modo incrementale
+@st.cache_resource(max_entries=4, show_spinner=False)
+def carica_forma(path_db, versione_db, path_forma, versione_forma, path_alias):
+    cache_mancata('forma_lega')
+    df = carica_database(path_db, versione_db)
+    vista, _ = leggi_vista(path_forma)
+    if df.empty or vista is None: return None
+    return forma_giocatori(df, vista, path_alias)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def carica_totali_squadre(path_db, versione_db, path_forma, versione_forma, path_storico, path_totali, path_alias):
+    cache_mancata('totali_lega')
+    df = carica_database(path_db, versione_db)
+    if df.empty or versione_forma is None: return None
+    return aggiorna_totali_squadre(rosa_voti(df, path_alias), path_storico, path_forma, path_totali)
+
+# Simulazione del resto della stagione: rifatta solo se cambiano calendario, database,
+# storico o parametri (stesso seed = stesse probabilita')
+@st.cache_resource(max_entries=4, show_spinner="Simulazione in corso...")
+def carica_simulazione(path_cal, versione_cal, path_db, versione_db, path_storico, versione_storico, path_alias, simulazioni, seed, posti_top, posti_retrocessione):
+    cache_mancata('simulazione')
+    calendario = carica_calendario(path_cal)
+    if calendario is None: return None
+    storico = leggi_storico(path_storico) if versione_storico else pd.DataFrame()
+    return simula_stagione(calendario, carica_database(path_db, versione_db), storico, simulazioni, seed, posti_top, posti_retrocessione, path_alias)
+
+# Righe dello storico dei giocatori della lega con la loro squadra: i fantavoti con altre
+# regole sono poi un solo prodotto per rerun
+@st.cache_resource(max_entries=4, show_spinner=False)
+def carica_righe_rose(path_storico, versione_storico, path_db, versione_db, path_alias):
+    cache_mancata('righe_rose')
+    df = carica_database(path_db, versione_db)
+    if df.empty or versione_storico is None: return None
+    return leggi_storico(path_storico).merge(rosa_voti(df, path_alias).rename('Fanta_Squadra'), left_on='clean_name', right_index=True)
 
-st.title("⚽ Fanta-Manager 2026")
+# --- MAIN EXECUTION ---
+inizia_rerun()
+verifica_asset()
 
 # SIDEBAR
 st.sidebar.header("Pannello Controllo")
+
+# Stagione e lega: i voti della stagione sono analizzati una volta e condivisi da tutte
+# le leghe, ognuna con rose, database, classifica e calendario propri
+if 'lega_creata' in st.session_state: st.session_state['lega'] = st.session_state.pop('lega_creata')
+stagioni = elenca_stagioni()
+stagione = st.sidebar.selectbox("📆 Stagione", stagioni, format_func=lambda s: s or "Principale", key="stagione", on_change=cambia_stagione) if len(stagioni) > 1 else ''
+leghe = elenca_leghe(stagione)
+if st.session_state.get('lega') not in leghe: st.session_state.pop('lega', None)
+lega = st.sidebar.selectbox("🏟️ Lega", leghe, format_func=lambda l: l or "Principale", key="lega", on_change=cambia_workspace) if len(leghe) > 1 else ''
+with st.sidebar.expander("➕ Nuova lega"):
+    nome_lega = st.text_input("Nome", key="nome_lega")
+    if st.button("Crea lega", key="crea_lega") and nome_lega:
+        try: st.session_state['lega_creata'] = crea_lega(nome_lega, stagione)
+        except ValueError as e: st.error(str(e))
+        else:
+            cambia_workspace()
+            st.rerun()
+ws = percorsi(stagione, lega)
+
+migra_storico_csv(ws['storico_csv'], ws['storico'])
+versione_db = versione_file(ws['database'])
+registra_cache('database', True)
+df = carica_database(ws['database'], versione_db)
+# Tabelle della sessione per il rapporto sulla memoria (solo riferimenti, misurate nel profilo)
+memoria_sessione = {"Database (condiviso)": (df, False)}
+
+# Regole di punteggio della lega: le fantamedie si ricalcolano dalle somme della stagione
+# gia' nel database, senza rileggere i file Voti. Classifica e simulazione restano ufficiali.
+if 'regola_salvata' in st.session_state: st.session_state['regola_punteggio'] = st.session_state.pop('regola_salvata')
+regole = leggi_regole(ws['regole'])
+if st.session_state.get('regola_punteggio') not in regole: st.session_state.pop('regola_punteggio', None)
+regola = st.sidebar.selectbox("🧮 Regole punteggio", list(regole), key="regola_punteggio") if len(regole) > 1 else REGOLA_STANDARD
+if not df.empty and regole[regola] != PESI_STANDARD:
+    df = df.assign(Fanta_Media=fanta_medie(df, {regola: regole[regola]})[regola].astype('float32'))
+    st.sidebar.caption(f"Fantamedie con le regole '{regola}'; classifica e simulazione usano i fantavoti ufficiali.")
+with st.sidebar.expander("🧮 Nuove regole"):
+    nome_regola = st.text_input("Nome", key="nome_regola")
+    c_a, c_b = st.columns(2)
+    pesi = {e: (c_a if i % 2 == 0 else c_b).number_input(NOMI_EVENTI[e], value=float(regole[regola][e]), step=0.5) for i, e in enumerate(EVENTI)}
+    if st.button("Salva regole", key="salva_regola") and nome_regola:
+        try: st.session_state['regola_salvata'] = salva_regola(nome_regola, pesi, ws['regole'])
+        except (ValueError, OSError) as e: st.error(str(e))
+        else: st.rerun()
+
+st.title("⚽ Fanta-Manager 2026")
 with st.sidebar.expander("Caricamenti veloci"):
     up_rose = st.file_uploader("📥 Importa Rose (xlsx/csv)", type=["xlsx", "csv"], key="rose_upl")
     if up_rose and st.button("Salva Rose Caricate", key="save_rose"):
-        if salva_file_caricato(up_rose, FILE_ROSE_IMPORT):
+        if salva_file_caricato(up_rose, ws['rose']):
             st.success("Rose aggiornate!")
             st.session_state.pop('selected_team', None)
             st.rerun()
 
     up_class = st.file_uploader("🏆 Importa Classifica (xlsx/csv)", type=["xlsx", "csv"], key="class_upl")
     if up_class and st.button("Salva Classifica", key="save_class"):
-        if salva_file_caricato(up_class, FILE_CLASSIFICA):
+        if salva_file_caricato(up_class, ws['classifica']):
             st.success("Classifica aggiornata!")
             st.rerun()
 
     up_cal = st.file_uploader("📅 Importa Calendario (xlsx/csv)", type=["xlsx", "csv"], key="cal_upl")
     if up_cal and st.button("Salva Calendario", key="save_cal"):
-        if salva_file_caricato(up_cal, FILE_CALENDARIO):
+        if salva_file_caricato(up_cal, ws['calendario']):
             st.success("Calendario aggiornato!")
             st.rerun()
+
+    # Una giornata alla volta: si analizza solo il file caricato (se la giornata c'era gia'
+    # il suo contributo viene prima tolto)
+    if 'avviso_giornata' in st.session_state: st.toast(st.session_state.pop('avviso_giornata'))
+    up_giornata = st.file_uploader("🗳️ Aggiungi Giornata Voti (xlsx)", type=["xlsx"], key="giornata_upl")
+    if up_giornata and st.button("Aggiungi Giornata", key="save_giornata"):
+        try:
+            numero, aggiornato, sostituiti = carica_giornata(up_giornata.getbuffer(), up_giornata.name, ws['database'], ws['voti'], ws['storico'],
+                                                             ws['statistiche'], ws['alias'], ws['forma'], ws['totali_squadre'])
+        except Exception as e: st.error(f"Errore giornata: {e}")
+        else:
+            if sostituiti: st.session_state['avviso_giornata'] = f"Giornata {numero}: sostituiti {', '.join(sostituiti)}"
+            if aggiornato is None: st.warning(f"Giornata {numero} salvata, ma il database e' vuoto: ricarica prima le rose.")
+            else: st.rerun()
 
 if st.sidebar.button("🔄 Ricarica Rose (Reset)"):
-    if os.path.exists(FILE_ROSE_IMPORT):
-        nuovo = importa_rose(FILE_ROSE_IMPORT)
-        if nuovo is not None:
-            nuovo.to_csv(FILE_DATABASE, index=False)
-            st.rerun()
+    if os.path.exists(ws['rose']):
+        try: ricostruisci_rose(ws['rose'], ws['database'])
+        except Exception as e: st.error(f"Errore lettura Rose: {e}")
+        else: st.rerun()
 
+processi_voti = st.sidebar.number_input("⚙️ Processi paralleli (Storico Voti)", min_value=1, value=1, step=1)
 if st.sidebar.button("📊 Aggiorna Storico Voti"):
-    if not os.path.exists(DIR_VOTI):
-        st.sidebar.warning("Cartella 'Voti' mancante.")
+    if not os.path.exists(ws['voti']):
+        st.sidebar.warning(f"Cartella '{ws['voti']}' mancante.")
     else:
-        voti_files = glob.glob(os.path.join(DIR_VOTI, "*Giornata*.xlsx"))
+        voti_files = elenca_file_voti(ws['voti'])
         if not voti_files:
-            st.sidebar.warning("Nessun file voti trovato nella cartella 'Voti'.")
+            st.sidebar.warning(f"Nessun file voti trovato nella cartella '{ws['voti']}'.")
         else:
-            df = elabora_storico_voti(df, DIR_VOTI)
-            df.to_csv(FILE_DATABASE, index=False)
-            st.rerun()
+            st.info(f"Elaborazione in corso... File trovati: {len(voti_files)}")
+            bar = st.progress(0)
+            try:
+                aggiornato = ricostruisci_voti(ws['database'], ws['voti'], ws['storico'], processi_voti, progresso=lambda fatti, totale: bar.progress(fatti / totale),
+                                               file_statistiche=ws['statistiche'], path_alias=ws['alias'], file_forma=ws['forma'], file_totali=ws['totali_squadre'])
+            except TimeoutError as e: st.sidebar.warning(f"{e}. Riprova tra poco.")
+            else:
+                if aggiornato is not None: st.rerun()
+                else: st.sidebar.warning("Database vuoto: ricarica prima le rose.")
+
+non_trovati = carica_alias(ws['alias'])['non_trovati']
+if non_trovati:
+    with st.sidebar.expander(f"⚠️ Giocatori senza voti ({len(non_trovati)})"):
+        st.caption("Nessun nome corrispondente nei file Voti: statistiche a zero.")
+        st.write(", ".join(non_trovati))
+
+vista_compatta = st.sidebar.toggle("⚡ Vista compatta (classifica e partite in un blocco)", value=True, key="vista_compatta")
+mostra_profilo = st.sidebar.checkbox("⏱️ Profilo prestazioni", key="mostra_profilo")
 
 st.sidebar.markdown("### 🌐 Probabili Formazioni")
 if st.sidebar.button("📡 Scarica da Gazzetta.it"):
     with st.spinner("Scraping Gazzetta in corso..."):
-        text_probabili = scarica_probabili_formazioni()
-        if text_probabili:
-            df['Status_Probabile'] = df['Giocatore'].apply(lambda x: verifica_titolare(x, text_probabili))
-            df.to_csv(FILE_DATABASE, index=False)
-            st.success("Fatto! Controlla la colonna 'News'.")
-            st.rerun()
-        else: st.warning("Impossibile scaricare le formazioni. Riprova più tardi.")
+        try: aggiornato = aggiorna_formazioni(ws['database'])
+        except TimeoutError as e: st.warning(f"{e}. Riprova tra poco.")
+        else:
+            if aggiornato is not None:
+                st.success("Fatto! Controlla la colonna 'News'.")
+                st.rerun()
+            else: st.warning("Impossibile scaricare le formazioni. Riprova più tardi.")
 
 if not df.empty and df['Partite_Giocate'].sum() > 0:
+    registra_cache('aggregati', True)
+    aggregati = aggregati_database(ws['database'], versione_db)
+    versione_forma = versione_file(ws['forma'])
+    registra_cache('forma_lega', True)
+    forma = carica_forma(ws['database'], versione_db, ws['forma'], versione_forma, ws['alias'])
 
     # --- 1. ULTIMA GIORNATA ---
-    if os.path.exists(FILE_CALENDARIO):
-        df_cal = parse_calendario_complesso(FILE_CALENDARIO)
-        if df_cal is not None:
-            giocate = df_cal[df_cal['Risultato'].astype(str).str.contains(r'\d', na=False)]
-            if not giocate.empty:
-                last_g = giocate['Giornata_Lega'].max()
-                matches_last = giocate[giocate['Giornata_Lega'] == last_g]
+    if os.path.exists(ws['calendario']):
+        calendario = carica_calendario(ws['calendario'])
+        if calendario is not None:
+            last_g = calendario['ultima_giocata']
+            if last_g is not None:
+                matches_last = partite_giornata(calendario, last_g)
+                matches_last = matches_last[matches_last['Giocata']]
                 st.markdown(f"##### 🏟️ Ultimo Turno: Giornata {last_g}")
-                rows_iter = [matches_last.iloc[i:i+2] for i in range(0, len(matches_last), 2)]
-                for row_matches in rows_iter:
-                    cols = st.columns(2)
-                    for idx, (index, match) in enumerate(row_matches.iterrows()):
-                        with cols[idx]:
-                            with st.container(border=True):
-                                cL, cC, cR = st.columns([1, 2, 1])
-                                hl = trova_logo_fanta(match['Casa'])
-                                al = trova_logo_fanta(match['Trasferta'])
-                                with cL:
-                                    if hl: st.image(hl, width=30)
-                                    st.markdown(f"<div style='font-size:12px; font-weight:bold; color:#333'>{match['Casa']}</div>", unsafe_allow_html=True)
-                                with cR:
-                                    if al: st.image(al, width=30)
-                                    st.markdown(f"<div style='font-size:12px; font-weight:bold; color:#333'>{match['Trasferta']}</div>", unsafe_allow_html=True)
-                                with cC:
-                                    st.markdown(f"<div style='text-align:center; font-weight:bold; font-size:20px; color:#1f77b4'>{match['Risultato']}</div>", unsafe_allow_html=True)
-                                    st.markdown(f"<div style='text-align:center; font-size:14px; font-weight:bold; color:#ff8c00'>({match['Punti_Casa']} - {match['Punti_Trasferta']})</div>", unsafe_allow_html=True)
+                if vista_compatta:
+                    with fase('render_ultimo_turno'): st.markdown(html_partite(matches_last), unsafe_allow_html=True)
+                else:
+                    rows_iter = [matches_last.iloc[i:i+2] for i in range(0, len(matches_last), 2)]
+                    for row_matches in rows_iter:
+                        cols = st.columns(2)
+                        for idx, (index, match) in enumerate(row_matches.iterrows()):
+                            with cols[idx]:
+                                with st.container(border=True):
+                                    cL, cC, cR = st.columns([1, 2, 1])
+                                    hl = trova_logo_fanta(match['Casa'])
+                                    al = trova_logo_fanta(match['Trasferta'])
+                                    with cL:
+                                        if hl: st.image(immagine_ridotta(hl, 30), width=30)
+                                        st.markdown(f"<div style='font-size:12px; font-weight:bold; color:#333'>{match['Casa']}</div>", unsafe_allow_html=True)
+                                    with cR:
+                                        if al: st.image(immagine_ridotta(al, 30), width=30)
+                                        st.markdown(f"<div style='font-size:12px; font-weight:bold; color:#333'>{match['Trasferta']}</div>", unsafe_allow_html=True)
+                                    with cC:
+                                        st.markdown(f"<div style='text-align:center; font-weight:bold; font-size:20px; color:#1f77b4'>{match['Risultato']}</div>", unsafe_allow_html=True)
+                                        st.markdown(f"<div style='text-align:center; font-size:14px; font-weight:bold; color:#ff8c00'>({match['Punti_Casa']} - {match['Punti_Trasferta']})</div>", unsafe_allow_html=True)
                 st.markdown("---")
 
     # --- KPI ---
     def card(label, name, val, sub, icon):
         return f"""<div style="background-color:white; padding:10px; border-radius:8px; border:1px solid #ddd; text-align:center; height: 120px; color:black;"><div style="font-size:12px; color:#555; margin-bottom:5px;">{icon} {label}</div><div style="font-weight:bold; font-size:16px; margin-bottom:5px; white-space:nowrap; overflow:hidden; text-overflow:ellipsis; color:black;">{name}</div><div style="font-size:20px; font-weight:bold; color:#1f77b4; margin-bottom:5px;">{val}</div><div style="font-size:11px; color:#333;">{sub}</div></div>"""
     c1, c2, c3, c4, c5 = st.columns(5)
-    top = df.loc[df['Gol_Totali'].idxmax()]
+    top = aggregati['capocannoniere']
     c1.markdown(card("Capocannoniere", top['Giocatore'], f"{int(top['Gol_Totali'])} Gol", top['Fanta_Squadra'], "👑"), unsafe_allow_html=True)
-    ass = df.loc[df['Assist'].idxmax()]
+    ass = aggregati['assist_man']
     c2.markdown(card("Assist Man", ass['Giocatore'], f"{int(ass['Assist'])} Assist", ass['Fanta_Squadra'], "👟"), unsafe_allow_html=True)
-    portieri = df[(df['Ruolo']=='P') & (df['Partite_Giocate'] > 4)].sort_values('Gol_Subiti')
-    best_p = portieri.iloc[0] if not portieri.empty else df.iloc[0]
+    best_p = aggregati['saracinesca']
     c3.markdown(card("Saracinesca", best_p['Giocatore'], f"{int(best_p['Gol_Subiti'])} Subiti", best_p['Fanta_Squadra'], "🧤"), unsafe_allow_html=True)
-    df['Malus_Tot'] = df['Ammonizioni'] + (df['Espulsioni'] * 3)
-    cattivo = df.loc[df['Malus_Tot'].idxmax()]
+    cattivo = aggregati['cattivo']
     c4.markdown(card("Il Cattivo", cattivo['Giocatore'], f"{int(cattivo['Malus_Tot'])} Malus", cattivo['Fanta_Squadra'], "🟨"), unsafe_allow_html=True)
-    rigorista = df.loc[df['Rigori_Segnati'].idxmax()]
+    rigorista = aggregati['cecchino']
     c5.markdown(card("Cecchino", rigorista['Giocatore'], f"{int(rigorista['Rigori_Segnati'])} Rig. Segnati", rigorista['Fanta_Squadra'], "🎯"), unsafe_allow_html=True)
 
     # TABS
     tab_class, tab_squadra, tab_giocatori, tab_match = st.tabs(["🏆 Classifica", "🏢 Scheda Squadra", "🏃 Giocatori", "🆚 Confronto"])
 
-    with tab_class:
-        if os.path.exists(FILE_CLASSIFICA):
-            df_cl = leggi_excel_intelligente(FILE_CLASSIFICA)
-            if df_cl is not None:
-                df_cl = df_cl.loc[:, ~df_cl.columns.str.contains('^Unnamed')]
-                df_cl = df_cl.dropna(how='all', axis=1)
-                stats_squadre = df.groupby('Fanta_Squadra')[['Media_Voto', 'Fanta_Media']].mean().reset_index()
-                col_squadra = next((c for c in df_cl.columns if 'squadra' in c.lower()), None)
-                if col_squadra:
-                    df_cl = pd.merge(df_cl, stats_squadre, left_on=col_squadra, right_on='Fanta_Squadra', how='left')
+    with tab_class, fase('tab_classifica'):
+        if os.path.exists(ws['classifica']):
+            registra_cache('classifica', True)
+            classifica = carica_classifica(ws['classifica'], versione_file(ws['classifica']), ws['database'], versione_db)
+            if classifica is not None:
+                df_cl, col_squadra, tabella = classifica
+                if col_squadra and vista_compatta:
+                    with fase('render_classifica'):
+                        evento = st.dataframe(
+                            stile_classifica(tabella), on_select="rerun", selection_mode="single-row", key="classifica_sel",
+                            hide_index=True, use_container_width=True, height=(len(tabella) + 1) * 35 + 3,
+                            column_config={"Logo": st.column_config.ImageColumn("", width="small"), "#": st.column_config.NumberColumn("#", format="%d"),
+                                           "Squadra": st.column_config.TextColumn("Squadra (Click)")})
+                    scelte = evento.selection.rows
+                    if scelte and st.session_state.get('selected_team') != tabella['Squadra'].iloc[scelte[0]]:
+                        st.session_state['selected_team'] = tabella['Squadra'].iloc[scelte[0]]
+                        st.toast(f"Vai a 'Scheda Squadra' per {st.session_state['selected_team']}")
+                elif col_squadra:
                     headers = st.columns([0.5, 0.5, 3, 1, 1, 1, 1, 1, 1, 1, 1])
                     labels = ["#", "", "Squadra (Click)", "G", "V", "N", "P", "Pt.", "Tot", "MV", "FM"]
                     for c, l in zip(headers, labels): c.markdown(f"**{l}**")
@@ -465,7 +375,7 @@ if not df.empty and df['Partite_Giocate'].sum() > 0:
                         logo_path = trova_logo_fanta(row[col_squadra])
                         cols[0].write(f"**{idx + 1}**")
                         with cols[1]:
-                            if logo_path: st.image(logo_path, width=25)
+                            if logo_path: st.image(immagine_ridotta(logo_path, 25), width=25)
                         if cols[2].button(f"**{row[col_squadra]}**", key=f"lnk_{idx}"):
                             st.session_state['selected_team'] = row[col_squadra]
                             st.toast(f"Vai a 'Scheda Squadra' per {row[col_squadra]}")
@@ -480,8 +390,28 @@ if not df.empty and df['Partite_Giocate'].sum() > 0:
                         st.markdown("<hr style='margin: 0px 0; border-top: 1px solid #eee'>", unsafe_allow_html=True)
             else: st.info("Manca File Classifica")
 
-    with tab_squadra:
-        teams = sorted(df['Fanta_Squadra'].unique())
+        if os.path.exists(ws['calendario']) and st.checkbox("🎲 Simula il resto della stagione", key="mostra_simulazione"):
+            # Posti in alto e in basso insieme al massimo quante le squadre del calendario
+            n_squadre = max(len(squadre_calendario(carica_calendario(ws['calendario']))), 1)
+            s1, s2, s3, s4 = st.columns(4)
+            simulazioni = s1.number_input("Simulazioni", min_value=1000, max_value=1_000_000, value=100_000, step=10_000)
+            seed = s2.number_input("Seed", min_value=0, value=0, step=1)
+            posti_top = s3.number_input("Posti in alto", min_value=1, max_value=n_squadre, value=min(4, n_squadre), step=1)
+            posti_retrocessione = s4.number_input("Posti in basso", min_value=0, max_value=n_squadre - posti_top, value=min(2, n_squadre - posti_top), step=1)
+            registra_cache('simulazione', True)
+            esito = carica_simulazione(ws['calendario'], versione_file(ws['calendario']), ws['database'], versione_db, ws['storico'], versione_file(ws['storico']),
+                                       ws['alias'], int(simulazioni), int(seed), int(posti_top), int(posti_retrocessione))
+            if esito is not None:
+                st.caption(f"{int(simulazioni):,} stagioni simulate sulle {esito.attrs['partite_rimaste']} partite rimaste")
+                st.dataframe(esito, hide_index=True, use_container_width=True, column_config={
+                    "Punti_Attesi": st.column_config.NumberColumn("Pt. attesi", format="%.1f"),
+                    "Posizione_Media": st.column_config.NumberColumn("Pos. media", format="%.2f"),
+                    "Titolo": st.column_config.ProgressColumn("Titolo", min_value=0, max_value=1, format="percent"),
+                    "Top": st.column_config.ProgressColumn(f"Primi {int(posti_top)}", min_value=0, max_value=1, format="percent"),
+                    "Retrocessione": st.column_config.ProgressColumn(f"Ultimi {int(posti_retrocessione)}", min_value=0, max_value=1, format="percent")})
+
+    with tab_squadra, fase('tab_squadra'):
+        teams = aggregati['squadre']
         default_idx = 0
         if 'selected_team' in st.session_state and st.session_state['selected_team'] in teams:
             default_idx = teams.index(st.session_state['selected_team'])
@@ -489,16 +419,15 @@ if not df.empty and df['Partite_Giocate'].sum() > 0:
         logo_t = trova_logo_fanta(sel_team_profile)
         c1, c2 = st.columns([1, 6])
         with c1: 
-            if logo_t: st.image(logo_t, width=100)
+            if logo_t: st.image(immagine_ridotta(logo_t, 100), width=100)
         with c2: 
             st.title(sel_team_profile)
         
-        if os.path.exists(FILE_CALENDARIO):
-            df_cal = parse_calendario_complesso(FILE_CALENDARIO)
-            if df_cal is not None:
-                future = df_cal[((df_cal['Casa'] == sel_team_profile) | (df_cal['Trasferta'] == sel_team_profile)) & (df_cal['Risultato'].isna() | (df_cal['Risultato'] == "") | (df_cal['Risultato'] == "-"))]
-                if not future.empty:
-                    nm = future.iloc[0]
+        if os.path.exists(ws['calendario']):
+            calendario = carica_calendario(ws['calendario'])
+            if calendario is not None:
+                nm = prossima_partita(calendario, sel_team_profile)
+                if nm is not None:
                     adv = nm['Trasferta'] if nm['Casa'] == sel_team_profile else nm['Casa']
                     st.info(f"📅 Prossimo Turno (G{nm['Giornata_Lega']}): contro **{adv}**")
         
@@ -508,6 +437,14 @@ if not df.empty and df['Partite_Giocate'].sum() > 0:
         m2.metric("FantaMedia Rosa", f"{d_team['Fanta_Media'].mean():.2f}")
         m3.metric("Gol Totali", f"{int(d_team['Gol_Totali'].sum())}")
         m4.metric("Valore Rosa", f"{d_team['Costo'].sum()}")
+
+        registra_cache('totali_lega', True)
+        totali = carica_totali_squadre(ws['database'], versione_db, ws['forma'], versione_forma, ws['storico'], ws['totali_squadre'], ws['alias'])
+        if totali is not None:
+            t_team = totali[totali['Fanta_Squadra'] == sel_team_profile]
+            if not t_team.empty:
+                st.caption("Fantavoti della rosa per giornata")
+                st.bar_chart(t_team.set_index('Giornata')['Fantavoto_Totale'], height=200)
         
         st.subheader("Rosa")
         d_team = d_team.sort_values('Ruolo', key=lambda x: x.map({'P':0, 'D':1, 'C':2, 'A':3}))
@@ -516,6 +453,7 @@ if not df.empty and df['Partite_Giocate'].sum() > 0:
         cols_ok = ['Pos', 'Ruolo', 'Giocatore', 'Logo_SerieA', 'Costo', 'Status_Probabile', 'Media_Voto', 'Fanta_Media', 'Partite_Giocate', 'Gol_Totali', 'Assist', 'Ammonizioni', 'Espulsioni']
         
         h_table = (len(d_team) + 1) * 35 + 3
+        memoria_sessione["Rosa (al browser)"] = (d_team[cols_ok], True)
         st.dataframe(
             d_team[cols_ok].style.map(applica_stile_ruoli, subset=['Ruolo']),
             use_container_width=True, 
@@ -524,33 +462,76 @@ if not df.empty and df['Partite_Giocate'].sum() > 0:
             column_config=get_table_config()
         )
 
-    with tab_giocatori:
+        # Formazione consigliata: calcolata a ogni rerun per tutte le squadre insieme
+        st.subheader("Formazione Consigliata")
+        criteri = ["Proiezione (FM + probabili)", "Forma recente"] if forma is not None else ["Proiezione (FM + probabili)"]
+        criterio = st.radio("Punteggio", criteri, horizontal=True, key="criterio_formazione")
+        punteggio = punteggio_forma(df, forma) if criterio == "Forma recente" else punteggio_proiezione(df)
+        totali_moduli, moduli_migliori, schieramento = ottimizza_formazioni(df, punteggio)
+        if sel_team_profile in moduli_migliori.index:
+            modulo = moduli_migliori[sel_team_profile]
+            totali_team = totali_moduli.loc[sel_team_profile]
+            st.markdown(f"**Modulo {modulo}** · punteggio {totali_team[modulo]:.2f}")
+            scelta = df[['Ruolo', 'Giocatore', 'Status_Probabile']].assign(Punti=punteggio).join(schieramento)
+            scelta = scelta[df['Fanta_Squadra'] == sel_team_profile].sort_values('Ordine')
+            f1, f2 = st.columns(2)
+            for col, titolo, parte in [(f1, "Titolari", scelta[scelta['Titolare'] == True]), (f2, "Panchina", scelta[scelta['Titolare'] == False])]:
+                col.caption(titolo)
+                col.dataframe(parte[['Ruolo', 'Giocatore', 'Status_Probabile', 'Punti']].style.map(applica_stile_ruoli, subset=['Ruolo']).format({'Punti': '{:.2f}'}),
+                              hide_index=True, use_container_width=True, column_config={"Status_Probabile": st.column_config.TextColumn("News", width="small")})
+            st.caption("Altri moduli: " + " · ".join(f"{m} {v:.2f}" if v > float('-inf') else f"{m} n.d." for m, v in totali_team.items()))
+
+    with tab_giocatori, fase('tab_giocatori'):
         st.subheader("Top Performers")
         c_r, c_o = st.columns(2)
         ruolo = c_r.radio("Filtro Ruolo", ["Tutti", "P", "D", "C", "A"], horizontal=True)
-        order = c_o.selectbox("Ordina", ["Fanta_Media", "Gol_Totali", "Assist", "Media_Voto"])
-        view = df.copy()
+        ordinamenti = ["Fanta_Media", "Gol_Totali", "Assist", "Media_Voto"]
+        cols_giocatori = cols_ok
+        if forma is not None:
+            ordinamenti += ["Forma", "Delta_Forma", "Serie_Presenze"]
+            cols_giocatori = cols_ok + ["Forma", "Delta_Forma", "Serie_Presenze"]
+        order = c_o.selectbox("Ordina", ordinamenti)
+        view = df.join(forma) if forma is not None else df.copy()
         if ruolo != "Tutti": view = view[view['Ruolo'] == ruolo]
         view = view.sort_values(order, ascending=False)
         view['Pos'] = range(1, len(view) + 1)
+        memoria_sessione["Top Performers (copia)"] = (view, False)
+        memoria_sessione["Top 50 (al browser)"] = (view.head(50)[cols_giocatori], True)
         st.dataframe(
-            view.head(50)[cols_ok].style.map(applica_stile_ruoli, subset=['Ruolo']),
+            view.head(50)[cols_giocatori].style.map(applica_stile_ruoli, subset=['Ruolo']),
             use_container_width=True, hide_index=True, column_config=get_table_config()
         )
+        if len(regole) > 1:
+            st.markdown("##### 🧮 Confronto Regole")
+            scelte = st.multiselect("Regole", list(regole), default=list(regole)[:4], key="regole_confronto")
+            if scelte:
+                sistemi = {r: regole[r] for r in scelte}
+                confronto = view[['Ruolo', 'Giocatore', 'Fanta_Squadra']].join(fanta_medie(view, sistemi))
+                confronto = confronto.sort_values(scelte[0], ascending=False).head(50)
+                st.dataframe(confronto.style.map(applica_stile_ruoli, subset=['Ruolo']).format({r: '{:.2f}' for r in scelte}),
+                             hide_index=True, use_container_width=True)
+                registra_cache('righe_rose', True)
+                righe = carica_righe_rose(ws['storico'], versione_file(ws['storico']), ws['database'], versione_db, ws['alias'])
+                if righe is not None and not righe.empty:
+                    # Fantapunti della rosa per giornata con ogni regola, su tutto lo storico
+                    squadre = fantavoti_storico(righe, sistemi).groupby(righe['Fanta_Squadra'].to_numpy()).sum() / righe['Giornata'].nunique()
+                    squadre = squadre.sort_values(scelte[0], ascending=False).rename_axis('Squadra').reset_index()
+                    st.caption("Fantapunti medi della rosa per giornata")
+                    st.dataframe(squadre.style.format({r: '{:.1f}' for r in scelte}), hide_index=True, use_container_width=True)
         st.divider()
         st.markdown("##### 📇 Dettaglio Giocatore")
-        sel_pl = st.selectbox("Cerca Nome:", sorted(df['Giocatore'].unique()), index=None)
+        sel_pl = st.selectbox("Cerca Nome:", aggregati['giocatori'], index=None)
         if sel_pl:
             p = df[df['Giocatore'] == sel_pl].iloc[0]
             col_c = get_role_color(p['Ruolo'])
             img = trova_immagine(p['Giocatore'])
             c1, c2 = st.columns([1, 4])
             with c1:
-                if img: st.image(img, width=120)
+                if img: st.image(immagine_ridotta(img, 120), width=120)
                 else: st.markdown(f"<div style='background:{col_c};width:100px;height:100px;border-radius:50%;display:flex;align-items:center;justify-content:center;color:white;font-size:30px;font-weight:bold'>{p['Ruolo']}</div>", unsafe_allow_html=True)
             with c2:
                 logo_club_path = p.get('Path_Logo')
-                if logo_club_path and os.path.exists(logo_club_path): st.image(logo_club_path, width=40)
+                if logo_club_path and os.path.exists(logo_club_path): st.image(immagine_ridotta(logo_club_path, 40), width=40)
                 st.markdown(f"<h3 style='color:{col_c}; margin:0'>{p['Giocatore']} {p['Status_Probabile']}</h3>", unsafe_allow_html=True)
                 st.markdown(f"**{p['Fanta_Squadra']}**")
                 k1, k2, k3, k4 = st.columns(4)
@@ -558,22 +539,22 @@ if not df.empty and df['Partite_Giocate'].sum() > 0:
                 k2.metric("FM", f"{p['Fanta_Media']:.2f}")
                 k3.metric("Gol", f"{int(p['Gol_Totali'])}")
                 k4.metric("Assist", f"{int(p['Assist'])}")
-            if os.path.exists(FILE_HISTORY):
-                df_h = pd.read_csv(FILE_HISTORY)
-                ph = df_h[df_h['clean_name'] == normalizza_nome(p['Giocatore'])].sort_values('Giornata')
+            if os.path.exists(ws['storico']):
+                ph = storico_giocatore(ws['storico'], nome_voti(p['Giocatore'], p.get('Squadra_SerieA'), ws['alias']))
                 if not ph.empty:
                     st.subheader("Storico Giornate")
+                    cols_h = [c for c in ['Giornata', 'Voto', 'Fantavoto', 'Gol', 'Assist', 'Amm', 'Esp', 'Rig.Fatti', 'Rig.Sba'] if c in ph.columns]
                     st.dataframe(
-                        ph[['Giornata', 'Voto', 'Fantavoto', 'Gol', 'Assist', 'Amm', 'Esp', 'Rig.Fatti', 'Rig.Sba']].style.format({"Voto": "{:.1f}", "Fantavoto": "{:.1f}", "Gol": "{:.0f}"}),
+                        ph[cols_h].style.format({"Voto": "{:.1f}", "Fantavoto": "{:.1f}", "Gol": "{:.0f}"}),
                         hide_index=True, use_container_width=True
                     )
                     st.caption("Andamento Fantavoto")
                     st.line_chart(ph.set_index('Giornata')['Fantavoto'])
 
-    with tab_match:
+    with tab_match, fase('tab_confronto'):
         c1, c2 = st.columns(2)
-        ta = c1.selectbox("Squadra A", sorted(df['Fanta_Squadra'].unique()), index=0)
-        tb = c2.selectbox("Squadra B", sorted(df['Fanta_Squadra'].unique()), index=1)
+        ta = c1.selectbox("Squadra A", aggregati['squadre'], index=0)
+        tb = c2.selectbox("Squadra B", aggregati['squadre'], index=1)
         da = df[df['Fanta_Squadra'] == ta]
         db = df[df['Fanta_Squadra'] == tb]
         la, lb = trova_logo_fanta(ta), trova_logo_fanta(tb)
@@ -589,10 +570,10 @@ if not df.empty and df['Partite_Giocate'].sum() > 0:
             return f"""<div style="display:flex; justify-content:space-between; align-items:center; border-bottom:1px solid #eee; padding:8px 0; color: black;"><div style="width:30%; text-align:center; font-weight:bold; font-size:18px; color:{color_a}">{val_a}</div><div style="width:40%; text-align:center; font-size:14px; color:#666;">{label}</div><div style="width:30%; text-align:center; font-weight:bold; font-size:18px; color:{color_b}">{val_b}</div></div>"""
         col_L, col_C, col_R = st.columns([1, 2, 1])
         with col_L:
-            if la: st.image(la, width=80)
+            if la: st.image(immagine_ridotta(la, 80), width=80)
             st.markdown(f"<h3 style='text-align:center'>{ta}</h3>", unsafe_allow_html=True)
         with col_R:
-            if lb: st.image(lb, width=80)
+            if lb: st.image(immagine_ridotta(lb, 80), width=80)
             st.markdown(f"<h3 style='text-align:center'>{tb}</h3>", unsafe_allow_html=True)
         with col_C:
             st.markdown("#### Confronto Statistico")
@@ -614,3 +595,18 @@ elif not df.empty:
     st.info("Caricamento...")
 else:
     st.warning("Carica il file Rose.")
+
+# --- PROFILO DEL RERUN ---
+profilo = chiudi_rerun()
+if mostra_profilo and profilo:
+    with st.sidebar.expander(f"⏱️ Rerun: {profilo['totale_ms']:.0f} ms", expanded=True):
+        fasi = pd.DataFrame([{'Fase': n, 'ms': v['ms'], 'Chiamate': v['chiamate'], 'Budget': v['budget_ms']} for n, v in profilo['fasi'].items()])
+        if not fasi.empty: st.dataframe(fasi.sort_values('ms', ascending=False), hide_index=True, use_container_width=True)
+        if profilo['fuori_budget']: st.warning(f"Fuori budget: {', '.join(profilo['fuori_budget'])}")
+        cache = pd.DataFrame([{'Cache': n, 'Chiamate': v['chiamate'], 'Hit %': round(100 * v['hit_rate']) if v['hit_rate'] is not None else None} for n, v in profilo['cache'].items()])
+        if not cache.empty: st.dataframe(cache, hide_index=True, use_container_width=True)
+        if not df.empty:
+            memoria = rapporto_memoria(memoria_sessione)
+            st.dataframe(memoria, hide_index=True, use_container_width=True, column_config={c: st.column_config.NumberColumn(format="%.0f") for c in ['Prima KB', 'Dopo KB']})
+            st.caption(f"Memoria: {memoria['Prima KB'].sum():.0f} KB con i tipi pieni, {memoria['Dopo KB'].sum():.0f} KB compatta")
+        st.caption("Storico dei rerun in .fanta_cache/profilo.jsonl")
@@ -0,0 +1,148 @@
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import itertools
+import platform
+import shutil
+import subprocess
+import tempfile
+import tracemalloc
+import pandas as pd
+from bench.genera_stagione import genera_stagione
+from fanta import asset
+from fanta.rose import importa_rose
+from fanta.lettura import leggi_excel_intelligente
+from fanta.calendario import parse_calendario_complesso
+from fanta.voti import elabora_storico_voti, elenca_file_voti, DIR_CACHE_VOTI
+from fanta.asset import trova_immagine, trova_logo_fanta, trova_logo_seriea, miniatura_base64, LATO_LOGO_TABELLA, DIR_MINIATURE
+
+# --- BENCHMARK ---
+# Genera una stagione sintetica per ogni punto di scala (leghe x rosa x giornate) e misura
+# le fasi della dashboard senza Streamlit: tempo (migliore di N ripetizioni) e picco di
+# memoria Python (tracemalloc, in una ripetizione a parte per non falsare i tempi).
+# Il picco riguarda solo il processo principale: i worker dei voti non sono inclusi.
+#
+#   python -m bench.bench_fanta --giornate 10,38 --json bench.json
+#   python -m bench.bench_fanta --confronta bench.json
+
+def misura(funzione, prepara=None, ripetizioni=3):
+    tempi = []
+    for _ in range(ripetizioni):
+        if prepara: prepara()
+        gc.collect()
+        inizio = time.perf_counter()
+        funzione()
+        tempi.append(time.perf_counter() - inizio)
+    if prepara: prepara()
+    gc.collect()
+    tracemalloc.start()
+    funzione()
+    picco = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(tempi), picco
+
+def svuota_asset():
+    asset._indici.clear()
+    asset.codifica_immagine.cache_clear()
+    asset.percorso_miniatura.cache_clear()
+    shutil.rmtree(DIR_MINIATURE, ignore_errors=True)
+
+def svuota_cache_voti():
+    shutil.rmtree(DIR_CACHE_VOTI, ignore_errors=True)
+
+def cerca_asset(rose):
+    for nome, club, squadra in zip(rose['Giocatore'], rose['Squadra_SerieA'], rose['Fanta_Squadra']):
+        trova_immagine(nome)
+        miniatura_base64(trova_logo_seriea(club), LATO_LOGO_TABELLA)
+        trova_logo_fanta(squadra)
+
+def fasi(stagione, processi):
+    # (nome, funzione, preparazione) per ogni fase misurata
+    lega = stagione['leghe'][0]
+    primo_voti = elenca_file_voti(stagione['voti'])[0]
+    rose = importa_rose(lega['rose'])
+    file_storico = os.path.join(os.path.dirname(lega['rose']), 'storico.parquet')
+    return [
+        ('leggi_excel_intelligente (classifica)', lambda: leggi_excel_intelligente(lega['classifica']), None),
+        ('leggi_excel_intelligente (voti)', lambda: leggi_excel_intelligente(primo_voti), None),
+        ('importa_rose', lambda: [importa_rose(l['rose']) for l in stagione['leghe']], svuota_asset),
+        ('parse_calendario_complesso', lambda: [parse_calendario_complesso(l['calendario']) for l in stagione['leghe']], None),
+        ('elabora_storico_voti (freddo)', lambda: elabora_storico_voti(rose.copy(), stagione['voti'], file_storico, processi), svuota_cache_voti),
+        ('elabora_storico_voti (caldo)', lambda: elabora_storico_voti(rose.copy(), stagione['voti'], file_storico, processi), None),
+        ('asset (freddo)', lambda: cerca_asset(rose), svuota_asset),
+        ('asset (caldo)', lambda: cerca_asset(rose), None),
+    ]
+
+def esegui_punto(leghe, squadre, rosa, giornate, args):
+    cartella = tempfile.mkdtemp(prefix='fanta_bench_') if not args.cartella else os.path.join(args.cartella, f"{leghe}x{rosa}x{giornate}")
+    os.makedirs(cartella, exist_ok=True)
+    origine = os.getcwd()
+    os.chdir(cartella)
+    try:
+        stagione = genera_stagione('.', leghe, squadre, rosa, giornate, args.seed)
+        svuota_asset()
+        risultati = []
+        for nome, funzione, prepara in fasi(stagione, args.processi):
+            secondi, picco = misura(funzione, prepara, args.ripetizioni)
+            risultati.append({'leghe': leghe, 'squadre': squadre, 'rosa': rosa, 'giornate': giornate,
+                              'fase': nome, 'secondi': round(secondi, 4), 'picco_mb': round(picco / 2**20, 2)})
+        return risultati
+    finally:
+        os.chdir(origine)
+        svuota_asset()
+        if not args.cartella:
+            shutil.rmtree(cartella, ignore_errors=True)
+
+def versione_codice():
+    try: return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError): return None
+
+def chiave(r):
+    return (r['leghe'], r['squadre'], r['rosa'], r['giornate'], r['fase'])
+
+def stampa(risultati, precedenti=None):
+    tabella = pd.DataFrame(risultati)
+    tabella['scala'] = tabella['leghe'].astype(str) + "x" + tabella['squadre'].astype(str) + "x" + tabella['rosa'].astype(str) + "x" + tabella['giornate'].astype(str)
+    tabella['ms'] = (tabella['secondi'] * 1000).round(1)
+    colonne = ['scala', 'fase', 'ms', 'picco_mb']
+    if precedenti:
+        prima = {chiave(r): r['secondi'] for r in precedenti['risultati']}
+        tabella['vs_prima'] = [f"{r['secondi'] / prima[chiave(r)]:.2f}x" if prima.get(chiave(r)) else "-" for r in risultati]
+        colonne.append('vs_prima')
+    print(tabella[colonne].to_string(index=False))
+
+def lista_interi(testo):
+    return [int(x) for x in testo.split(',') if x.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark della pipeline Fanta-Manager su stagioni sintetiche")
+    parser.add_argument('--leghe', type=lista_interi, default=[1], help="numero di leghe, es. 1,4")
+    parser.add_argument('--squadre', type=int, default=8, help="squadre per lega")
+    parser.add_argument('--rosa', type=lista_interi, default=[25], help="giocatori per rosa, es. 25,30")
+    parser.add_argument('--giornate', type=lista_interi, default=[10, 38], help="giornate, es. 10,38")
+    parser.add_argument('--ripetizioni', type=int, default=3)
+    parser.add_argument('--processi', type=int, default=None, help="processi per i voti (default: automatico)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cartella', default=None, help="conserva i file generati in questa cartella")
+    parser.add_argument('--json', default=None, help="salva i risultati in un file JSON")
+    parser.add_argument('--confronta', default=None, help="JSON di una esecuzione precedente da confrontare")
+    args = parser.parse_args(argv)
+
+    precedenti = None
+    if args.confronta:
+        with open(args.confronta, encoding='utf-8') as f: precedenti = json.load(f)
+    risultati = []
+    for leghe, rosa, giornate in itertools.product(args.leghe, args.rosa, args.giornate):
+        print(f"... {leghe} leghe x {args.squadre} squadre x {rosa} giocatori x {giornate} giornate", file=sys.stderr)
+        risultati.extend(esegui_punto(leghe, args.squadre, rosa, giornate, args))
+    stampa(risultati, precedenti)
+    if args.json:
+        rapporto = {'commit': versione_codice(), 'python': platform.python_version(), 'pandas': pd.__version__,
+                    'cpu': os.cpu_count(), 'seed': args.seed, 'risultati': risultati}
+        with open(args.json, 'w', encoding='utf-8') as f: json.dump(rapporto, f, indent=2)
+
+if __name__ == "__main__":
+    main()
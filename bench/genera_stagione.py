@@ -0,0 +1,175 @@
+import os
+import random
+import zlib
+import struct
+import pandas as pd
+from fanta.nomi import MAPPA_SERIE_A
+
+# --- STAGIONE SINTETICA ---
+# Scrive file con la stessa struttura di quelli scaricati da fantacalcio.it:
+# Rose (blocchi affiancati per squadra), Voti (un file per giornata, blocchi per club),
+# Calendario (blocchi "Nª Giornata lega" affiancati), Classifica, loghi e foto.
+# Con lo stesso seed si ottengono sempre gli stessi file.
+
+SILLABE = ['ba', 'ce', 'di', 'fo', 'gu', 'la', 'me', 'ni', 'po', 'ri', 'sa', 'te', 'vo', 'za', 'lo', 'ma', 'no', 'ti', 'ro', 'ca']
+FINALI = ['', 'i', 'o', 'a', 'ni', 'lli', 'tti', 'ez', 'ic', 'sson']
+RUOLI = [('P', 3), ('D', 8), ('C', 8), ('A', 6)]
+
+def nome_casuale(rng, usati):
+    while True:
+        cognome = "".join(rng.choice(SILLABE) for _ in range(rng.randint(2, 3))) + rng.choice(FINALI)
+        nome = cognome.capitalize()
+        if rng.random() < 0.1: nome += f" {rng.choice('ABCDEFGLMPRST')}."
+        if nome not in usati:
+            usati.add(nome)
+            return nome
+
+def ruoli_rosa(n):
+    # Stessa proporzione 3/8/8/6 di una rosa da 25, scalata su n giocatori
+    quote = [max(1, round(n * q / 25)) for _, q in RUOLI]
+    quote[-1] += n - sum(quote)
+    return [r for (r, _), q in zip(RUOLI, quote) for _ in range(q)]
+
+def png_minimo(seme):
+    # PNG 1x1 valido: basta per loghi e foto
+    def chunk(tipo, dati):
+        return struct.pack('>I', len(dati)) + tipo + dati + struct.pack('>I', zlib.crc32(tipo + dati))
+    pixel = zlib.compress(bytes([0, seme % 256, (seme * 7) % 256, (seme * 13) % 256]))
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', 1, 1, 8, 2, 0, 0, 0)) + chunk(b'IDAT', pixel) + chunk(b'IEND', b'')
+
+def scrivi_foglio(righe, path):
+    pd.DataFrame(righe).to_excel(path, header=False, index=False)
+
+# --- GIOCATORI DI SERIE A ---
+def genera_serie_a(rng, giocatori_per_club):
+    usati = set()
+    clubs = {}
+    for sigla, nome_club in MAPPA_SERIE_A.items():
+        ruoli = ruoli_rosa(giocatori_per_club)
+        clubs[sigla] = {'nome': nome_club.capitalize(), 'giocatori': [(r, nome_casuale(rng, usati)) for r in ruoli]}
+    return clubs
+
+# --- ROSE ---
+def genera_rose(rng, clubs, squadre, rosa, path):
+    per_ruolo = {}
+    for sigla, club in clubs.items():
+        for ruolo, nome in club['giocatori']: per_ruolo.setdefault(ruolo, []).append((nome, sigla))
+    for lista in per_ruolo.values(): rng.shuffle(lista)
+    righe = [["Rose lega sintetica"], ["https://leghe.fantacalcio.it/bench"], ["* Calciatori non più in campionato"], []]
+    blocchi = []
+    for nome_squadra in squadre:
+        blocco = [[nome_squadra], ["Ruolo", "Calciatore", "Squadra", "Costo"]]
+        for ruolo in ruoli_rosa(rosa):
+            nome, sigla = per_ruolo[ruolo].pop()
+            blocco.append([ruolo, nome, sigla, rng.randint(1, 80)])
+        blocco.append([f"Crediti Residui: {rng.randint(0, 20)}"])
+        blocchi.append(blocco)
+    # Due squadre affiancate per riga, separate da una colonna vuota
+    for i in range(0, len(blocchi), 2):
+        sinistra = blocchi[i]
+        destra = blocchi[i + 1] if i + 1 < len(blocchi) else []
+        for k in range(max(len(sinistra), len(destra))):
+            a = sinistra[k] if k < len(sinistra) else []
+            b = destra[k] if k < len(destra) else []
+            righe.append(a + [None] * (5 - len(a)) + b if b else a)
+        righe.append([])
+    scrivi_foglio(righe, path)
+
+# --- VOTI ---
+def genera_voti(rng, clubs, giornata, path):
+    righe = [[f"Voti Fantacalcio {giornata}ª giornata di campionato"], ["Solo su www.fantacalcio.it i voti ufficiali"],
+             ["QUESTO FILE NON PUO' ESSERE RIPRODOTTO"], ["USO PERSONALE"]]
+    codice = 1000
+    for sigla, club in clubs.items():
+        righe.append([club['nome']])
+        righe.append(["Cod.", "Ruolo", "Nome", "Voto", "Gf", "Gs", "Rp", "Rs", "Rf", "Au", "Amm", "Esp", "Ass"])
+        for ruolo, nome in club['giocatori']:
+            codice += 1
+            if rng.random() < 0.35: continue
+            voto = rng.choice([4.5, 5, 5.5, 6, 6, 6.5, 6.5, 7, 7.5, 8])
+            gol = int(rng.random() < (0.25 if ruolo == 'A' else 0.08 if ruolo == 'C' else 0.02))
+            subiti = rng.randint(0, 3) if ruolo == 'P' else 0
+            parato = int(ruolo == 'P' and rng.random() < 0.05)
+            rigore = int(gol and rng.random() < 0.2)
+            voto_cella = f"{voto}*" if rng.random() < 0.03 else voto
+            righe.append([codice, ruolo, nome, voto_cella, gol, subiti, parato, 0, rigore, 0,
+                          int(rng.random() < 0.15), int(rng.random() < 0.01), int(rng.random() < 0.08)])
+    scrivi_foglio(righe, path)
+
+# --- CALENDARIO E CLASSIFICA ---
+def accoppiamenti(squadre, turno):
+    # Girone all'italiana (metodo del cerchio), ripetuto ciclicamente
+    n = len(squadre)
+    giro = turno % (n - 1)
+    ordine = [squadre[0]] + squadre[1:][giro:] + squadre[1:][:giro]
+    return [(ordine[i], ordine[n - 1 - i]) for i in range(n // 2)]
+
+def genera_calendario(rng, squadre, giornate, giocate, path):
+    righe = [["Calendario Campionato"], ["https://leghe.fantacalcio.it/bench"], []]
+    blocchi = []
+    for g in range(1, giornate + 1):
+        blocco = [[f"{g}ª Giornata lega", None, f"{g + 2}ª Giornata serie a", None, None]]
+        for casa, trasferta in accoppiamenti(squadre, g - 1):
+            if g <= giocate:
+                pc, pt = rng.randint(120, 160) / 2, rng.randint(120, 160) / 2
+                risultato = f"{max(0, int((pc - 66) // 6) + 1)}-{max(0, int((pt - 66) // 6) + 1)}"
+            else: pc, pt, risultato = None, None, "-"
+            blocco.append([casa, pc, pt, trasferta, risultato])
+        blocchi.append(blocco)
+    for i in range(0, len(blocchi), 2):
+        sinistra = blocchi[i]
+        destra = blocchi[i + 1] if i + 1 < len(blocchi) else None
+        for k in range(len(sinistra)):
+            righe.append(sinistra[k] + [None] + destra[k] if destra else sinistra[k])
+    scrivi_foglio(righe, path)
+
+def genera_classifica(rng, squadre, giocate, path):
+    righe = [["Classifica Campionato"], ["https://leghe.fantacalcio.it/bench"], [],
+             ["Pos", "Squadra", None, "G", "V", "N", "P", "Gf", "Gs", "Dr", "Pt.", "Pt. Totali"]]
+    for pos, squadra in enumerate(squadre, 1):
+        v = rng.randint(0, giocate); n = rng.randint(0, giocate - v); p = giocate - v - n
+        gf, gs = rng.randint(0, 3 * giocate), rng.randint(0, 3 * giocate)
+        righe.append([pos, squadra, None, giocate, v, n, p, gf, gs, gf - gs, 3 * v + n, rng.randint(60, 75) * giocate])
+    scrivi_foglio(righe, path)
+
+# --- STAGIONE COMPLETA ---
+def genera_stagione(directory, leghe=1, squadre=8, rosa=25, giornate=38, seed=0, foto=0.5):
+    # Ritorna i percorsi dei file generati; i Voti sono condivisi da tutte le leghe
+    rng = random.Random(seed)
+    # Margine del 30%: le quote per ruolo arrotondate non devono restare senza giocatori
+    giocatori_per_club = max(30, -(-squadre * rosa * 13 // (10 * len(MAPPA_SERIE_A))) + 5)
+    clubs = genera_serie_a(rng, giocatori_per_club)
+    dir_voti = os.path.join(directory, 'Voti')
+    dir_logo = os.path.join(directory, 'logo')
+    dir_img = os.path.join(directory, 'img')
+    for d in (dir_voti, dir_logo, dir_img): os.makedirs(d, exist_ok=True)
+
+    stagione = {'voti': dir_voti, 'leghe': []}
+    for g in range(1, giornate + 1):
+        genera_voti(rng, clubs, g, os.path.join(dir_voti, f"Voti_Fantacalcio_Stagione_Bench_Giornata_{g}.xlsx"))
+    giocate = max(1, giornate - 2)
+    usati = set()
+    for l in range(1, leghe + 1):
+        nomi_squadre = [f"FC {nome_casuale(rng, usati)}" for _ in range(squadre)]
+        lega = {
+            'squadre': nomi_squadre,
+            'rose': os.path.join(directory, f"Rose_lega_{l}.xlsx"),
+            'calendario': os.path.join(directory, f"Calendario_lega_{l}.xlsx"),
+            'classifica': os.path.join(directory, f"Classifica_lega_{l}.xlsx"),
+        }
+        genera_rose(rng, clubs, nomi_squadre, rosa, lega['rose'])
+        genera_calendario(rng, nomi_squadre, giornate, giocate, lega['calendario'])
+        genera_classifica(rng, nomi_squadre, giocate, lega['classifica'])
+        stagione['leghe'].append(lega)
+
+    # Loghi: uno per club di Serie A e per squadra; foto solo per una parte dei giocatori
+    for i, nome_club in enumerate(MAPPA_SERIE_A.values()):
+        with open(os.path.join(dir_logo, f"{nome_club}.png"), 'wb') as f: f.write(png_minimo(i))
+    for i, lega in enumerate(stagione['leghe']):
+        for j, squadra in enumerate(lega['squadre']):
+            with open(os.path.join(dir_logo, f"{squadra}.png"), 'wb') as f: f.write(png_minimo(100 + i * squadre + j))
+    for club in clubs.values():
+        for _, nome in club['giocatori']:
+            if rng.random() < foto:
+                with open(os.path.join(dir_img, f"{nome.lower()}.png"), 'wb') as f: f.write(png_minimo(len(nome)))
+    return stagione
@@ -0,0 +1,160 @@
+import io
+import os
+import base64
+import hashlib
+from functools import lru_cache
+import pandas as pd
+from PIL import Image
+from fanta.nomi import normalizza_nome, parole_chiave, MAPPA_SERIE_A
+from fanta.profilo import registra_cache, cache_mancata
+from fanta.persistenza import scrivi_atomico
+
+DIR_IMG = 'img'
+DIR_LOGO = 'logo'
+DIR_MINIATURE = os.path.join('.fanta_cache', 'miniature')
+# Lato in pixel dei loghi nella colonna immagine delle tabelle
+LATO_LOGO_TABELLA = 64
+# st.image a larghezza w riceve una miniatura di lato w * DENSITA (schermi ad alta densita')
+DENSITA = 2
+
+# --- INDICE IN MEMORIA DELLE CARTELLE IMMAGINI ---
+# Ogni cartella viene letta una volta sola; le ricerche per nome lavorano sull'indice
+# e memorizzano il risultato. verifica_asset() (una volta per rerun) scarta gli indici
+# delle cartelle modificate.
+_indici = {}
+
+def versione_cartella(directory):
+    try: return os.stat(directory).st_mtime_ns
+    except OSError: return None
+
+def indice_cartella(directory):
+    indice = _indici.get(directory)
+    if indice is not None: return indice
+    versione = versione_cartella(directory)
+    files = os.listdir(directory) if versione is not None and os.path.isdir(directory) else None
+    indice = {'versione': versione, 'files': None, 'esatti': {}, 'parole': {}, 'risultati': {}}
+    if files is not None:
+        indice['files'] = [(f, normalizza_nome(f.split('.')[0]), os.path.join(directory, f)) for f in files]
+        for pos, (f, stem, path) in reversed(list(enumerate(indice['files']))):
+            indice['esatti'][stem] = path
+            # Blocchi per parola del nome: primo file (in ordine di cartella) che la contiene
+            for p in parole_chiave(stem, 4): indice['parole'][p] = (pos, path)
+    _indici[directory] = indice
+    return indice
+
+def verifica_asset(cartelle=None):
+    cambiate = False
+    for directory in (cartelle or list(_indici)):
+        indice = _indici.get(directory)
+        if indice is not None and indice['versione'] != versione_cartella(directory):
+            _indici.pop(directory)
+            cambiate = True
+    if cambiate:
+        codifica_immagine.cache_clear()
+        percorso_miniatura.cache_clear()
+
+def cerca_in_cartella(directory, tipo, chiave, ricerca):
+    indice = indice_cartella(directory)
+    if indice['files'] is None: return None
+    registra_cache('asset', (tipo, chiave) in indice['risultati'])
+    if (tipo, chiave) not in indice['risultati']:
+        indice['risultati'][(tipo, chiave)] = ricerca(indice)
+    return indice['risultati'][(tipo, chiave)]
+
+# --- RICERCA IMMAGINI E LOGHI ---
+def trova_immagine(nome_giocatore):
+    nome_clean = normalizza_nome(nome_giocatore)
+    def ricerca(indice):
+        if nome_clean in indice['esatti']: return indice['esatti'][nome_clean]
+        candidati = [indice['parole'][p] for p in parole_chiave(nome_clean, 4) if p in indice['parole']]
+        return min(candidati)[1] if candidati else None
+    return cerca_in_cartella(DIR_IMG, 'img', nome_clean, ricerca)
+
+def trova_logo_fanta(nome_squadra):
+    if pd.isna(nome_squadra): return None
+    nome_clean = normalizza_nome(nome_squadra)
+    def ricerca(indice):
+        if nome_clean in indice['esatti']: return indice['esatti'][nome_clean]
+        for f, stem, path in indice['files']:
+            if nome_clean in stem: return path
+        return None
+    return cerca_in_cartella(DIR_LOGO, 'fanta', nome_clean, ricerca)
+
+def trova_logo_seriea(sigla_excel):
+    if pd.isna(sigla_excel): return None
+    chiave = str(sigla_excel).capitalize()
+    nome_target = MAPPA_SERIE_A.get(chiave, str(sigla_excel).lower())
+    def ricerca(indice):
+        for f, stem, path in indice['files']:
+            if f.lower().startswith(nome_target.lower() + "."): return path
+        return None
+    return cerca_in_cartella(DIR_LOGO, 'seriea', nome_target, ricerca)
+
+# --- CODIFICA BASE64 (LRU) ---
+# Chiave (path, mtime): un file riscritto con lo stesso nome si ricodifica
+@lru_cache(maxsize=256)
+def codifica_immagine(path, mtime):
+    cache_mancata('logo_base64')
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        encoded = base64.b64encode(data).decode()
+        return f"data:image/png;base64,{encoded}"
+    except: return None
+
+def img_to_base64(path):
+    if not path or pd.isna(path): return None
+    try: mtime = os.path.getmtime(path)
+    except OSError: return None
+    registra_cache('logo_base64', True)
+    return codifica_immagine(path, mtime)
+
+# --- MINIATURE SU DISCO ---
+# Ogni immagine si riduce una volta per lato richiesto e si salva in .fanta_cache/miniature.
+# Nel nome del file ci sono mtime e dimensione della sorgente: un logo sostituito produce
+# una miniatura nuova e la vecchia si cancella. Dopo la prima volta (anche in altre
+# sessioni o processi) basta uno stat della sorgente.
+def file_miniatura(path, lato, mtime, dimensione):
+    radice = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(DIR_MINIATURE, f"{radice}_{lato}_{mtime}_{dimensione}.png")
+
+def genera_miniatura(path, lato, destinazione):
+    with Image.open(path) as img:
+        img.thumbnail((lato, lato))
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG', optimize=True)
+    dati = buffer.getvalue()
+    # Se la sorgente e' gia' piccola e compressa meglio, si tiene quella
+    if os.path.getsize(path) <= len(dati) and path.lower().endswith('.png'):
+        with open(path, 'rb') as f: dati = f.read()
+    prefisso = os.path.basename(destinazione).rsplit('_', 2)[0] + '_'
+    for vecchia in os.listdir(DIR_MINIATURE) if os.path.isdir(DIR_MINIATURE) else []:
+        if vecchia.startswith(prefisso) and vecchia != os.path.basename(destinazione):
+            try: os.remove(os.path.join(DIR_MINIATURE, vecchia))
+            except OSError: pass
+    scrivi_atomico(destinazione, dati)
+
+@lru_cache(maxsize=1024)
+def percorso_miniatura(path, lato, mtime, dimensione):
+    destinazione = file_miniatura(path, lato, mtime, dimensione)
+    if os.path.exists(destinazione): return destinazione
+    cache_mancata('miniature')
+    try: genera_miniatura(path, lato, destinazione)
+    except Exception: return None
+    return destinazione
+
+def miniatura(path, lato):
+    # Percorso della miniatura PNG (creata se manca); None se la sorgente non si legge
+    if not path or pd.isna(path): return None
+    try: info = os.stat(path)
+    except OSError: return None
+    registra_cache('miniature', True)
+    return percorso_miniatura(path, lato, info.st_mtime_ns, info.st_size)
+
+def immagine_ridotta(path, larghezza):
+    # Per st.image: la miniatura adatta alla larghezza mostrata, altrimenti l'originale
+    return miniatura(path, larghezza * DENSITA) or path
+
+def miniatura_base64(path, lato=64):
+    # Per i loghi inseriti direttamente nell'HTML o nelle tabelle: pochi KB invece dell'originale
+    return img_to_base64(miniatura(path, lato))
@@ -0,0 +1,88 @@
+import re
+import numpy as np
+import pandas as pd
+from fanta.lettura import leggi_foglio
+from fanta.profilo import cronometrato, registra_cache
+from fanta.persistenza import firma_dati
+
+# --- PARSER CALENDARIO ---
+# Il foglio contiene blocchi affiancati: una cella "Nª Giornata lega" (con "Mª Giornata
+# serie a" due colonne a destra) seguita dalle partite Casa | Pt | Pt | Trasferta | Risultato,
+# fino alla prima cella vuota o alla giornata successiva.
+
+def contiene(testo, parola):
+    return testo.apply(lambda c: c.str.contains(parola, regex=False)).to_numpy()
+
+@cronometrato('parse_calendario_complesso')
+def parse_calendario_complesso(filepath):
+    try:
+        df = leggi_foglio(filepath)
+        rows, cols = df.shape
+        testo = df.astype(str).apply(lambda c: c.str.lower())
+        fine_blocco = df.isna().to_numpy() | contiene(testo, 'giornata')
+        blocchi = []
+        for r, c in np.argwhere(contiene(testo, 'giornata lega')):
+            if c + 4 >= cols: continue
+            numero = re.search(r'(\d+)', testo.iat[r, c])
+            if not numero: continue
+            g_seriea = None
+            if c + 2 < cols and "serie a" in testo.iat[r, c + 2]:
+                found = re.search(r'(\d+)', testo.iat[r, c + 2])
+                g_seriea = int(found.group(1)) if found else None
+            stop = np.flatnonzero(fine_blocco[r + 1:, c])
+            fine = r + 1 + stop[0] if len(stop) else rows
+            blocco = df.iloc[r + 1:fine, c:c + 5].copy()
+            blocco.columns = ['Casa', 'Punti_Casa', 'Punti_Trasferta', 'Trasferta', 'Risultato']
+            blocco.insert(0, 'Giornata_SerieA', g_seriea)
+            blocco.insert(0, 'Giornata_Lega', int(numero.group(1)))
+            blocchi.append(blocco)
+        if not blocchi: return None
+        partite = pd.concat(blocchi, ignore_index=True)
+        partite['Giornata_SerieA'] = partite['Giornata_SerieA'].astype('Int64')
+        partite['Punti_Casa'] = pd.to_numeric(partite['Punti_Casa'], errors='coerce')
+        partite['Punti_Trasferta'] = pd.to_numeric(partite['Punti_Trasferta'], errors='coerce')
+        return partite.sort_values('Giornata_Lega', kind='stable').reset_index(drop=True)
+    except Exception: return None
+
+# --- CALENDARIO INDICIZZATO (CACHE PER MTIME) ---
+_calendari = {}
+
+def indicizza_calendario(partite):
+    risultato = partite['Risultato']
+    partite = partite.assign(
+        Giocata=risultato.astype(str).str.contains(r'\d', na=False),
+        Da_Giocare=risultato.isna() | (risultato == "") | (risultato == "-"))
+    casa = partite.groupby('Casa', sort=False).indices
+    trasferta = partite.groupby('Trasferta', sort=False).indices
+    per_squadra = {t: np.union1d(casa.get(t, []), trasferta.get(t, [])).astype(int) for t in set(casa) | set(trasferta)}
+    giocate = partite.loc[partite['Giocata'], 'Giornata_Lega']
+    return {
+        'partite': partite,
+        'per_squadra': per_squadra,
+        'per_giornata': partite.groupby('Giornata_Lega').indices,
+        'ultima_giocata': int(giocate.max()) if not giocate.empty else None,
+    }
+
+def carica_calendario(filepath):
+    # Parsing e indici vengono rifatti solo se il file e' cambiato
+    firma = firma_dati(filepath)
+    if firma is None: return None
+    salvato = _calendari.get(filepath)
+    registra_cache('calendario', bool(salvato and salvato[0] == firma))
+    if salvato and salvato[0] == firma: return salvato[1]
+    partite = parse_calendario_complesso(filepath)
+    calendario = indicizza_calendario(partite) if partite is not None else None
+    _calendari[filepath] = (firma, calendario)
+    return calendario
+
+def partite_giornata(calendario, giornata):
+    righe = calendario['per_giornata'].get(giornata, [])
+    return calendario['partite'].iloc[righe]
+
+def partite_squadra(calendario, squadra):
+    return calendario['partite'].iloc[calendario['per_squadra'].get(squadra, [])]
+
+def prossima_partita(calendario, squadra):
+    partite = partite_squadra(calendario, squadra)
+    future = partite[partite['Da_Giocare']]
+    return future.iloc[0] if not future.empty else None
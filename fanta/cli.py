@@ -0,0 +1,111 @@
+import os
+import sys
+import argparse
+from fanta.percorsi import percorsi, elenca_leghe
+from fanta.voti import elenca_file_voti
+from fanta.ingestione import ricostruisci_rose, ricostruisci_voti, carica_giornata, aggiorna_formazioni
+
+# --- RIGA DI COMANDO ---
+#   python -m fanta rose          ricostruisce il database dal file Rose
+#   python -m fanta voti          ricalcola statistiche e storico dai file Voti
+#   python -m fanta giornata F    aggiunge (o sostituisce) una giornata dal file Voti F
+#   python -m fanta formazioni    aggiorna i titolari dalle probabili formazioni
+#   python -m fanta tutto         le tre operazioni in fila
+#
+# --stagione e --lega scelgono i file del workspace (stagioni/<s>/leghe/<l>); con
+# 'voti --tutte' il corpus voti della stagione si analizza una volta e si unisce a ogni lega.
+
+def comando_rose(args):
+    df = ricostruisci_rose(args.file_rose, args.database)
+    print(f"Rose: {len(df)} giocatori, {df['Fanta_Squadra'].nunique() if not df.empty else 0} squadre -> {args.database}")
+    return 0
+
+def voti_lega(args, files, database, alias, totali):
+    df = ricostruisci_voti(database, args.voti, args.storico, args.processi, file_statistiche=args.statistiche, path_alias=alias,
+                           file_forma=args.forma, file_totali=totali)
+    if df is None:
+        print(f"Database vuoto o mancante: {database}. Esegui prima 'rose'.", file=sys.stderr)
+        return 1
+    print(f"Voti: {len(files)} giornate, {int((df['Partite_Giocate'] > 0).sum())} giocatori con presenze -> {database}, {args.storico}")
+    return 0
+
+def comando_voti(args):
+    files = elenca_file_voti(args.voti)
+    if not files:
+        print(f"Nessun file voti trovato in '{args.voti}'.", file=sys.stderr)
+        return 1
+    if not args.tutte: return voti_lega(args, files, args.database, args.alias, percorsi(args.stagione, args.lega)['totali_squadre'])
+    codice = 0
+    for lega in elenca_leghe(args.stagione):
+        ws = percorsi(args.stagione, lega)
+        if not os.path.exists(ws['database']): continue
+        codice = voti_lega(args, files, ws['database'], ws['alias'], ws['totali_squadre']) or codice
+    return codice
+
+def comando_giornata(args):
+    with open(args.file, 'rb') as f: dati = f.read()
+    numero, df, sostituiti = carica_giornata(dati, os.path.basename(args.file), args.database, args.voti, args.storico, args.statistiche,
+                                 args.alias, args.forma, percorsi(args.stagione, args.lega)['totali_squadre'])
+    if sostituiti: print(f"Giornata {numero}: sostituiti {', '.join(sostituiti)}")
+    if df is None:
+        print(f"Giornata {numero} aggiunta a '{args.voti}'; database vuoto o mancante: {args.database}.", file=sys.stderr)
+        return 1
+    print(f"Giornata {numero} aggiunta a '{args.voti}': {int((df['Partite_Giocate'] > 0).sum())} giocatori con presenze -> {args.database}")
+    return 0
+
+def comando_formazioni(args):
+    df = aggiorna_formazioni(args.database, args.fixture)
+    if df is None:
+        print("Impossibile aggiornare le formazioni (pagina non disponibile o database vuoto).", file=sys.stderr)
+        return 1
+    print(f"Formazioni: {int((df['Status_Probabile'] == '🟢').sum())} titolari -> {args.database}")
+    return 0
+
+def comando_tutto(args):
+    for comando in (comando_rose, comando_voti, comando_formazioni):
+        codice = comando(args)
+        if codice: return codice
+    return 0
+
+def crea_parser():
+    # Le opzioni valgono per tutti i comandi e vanno scritte dopo il comando
+    comuni = argparse.ArgumentParser(add_help=False)
+    # I percorsi non indicati vengono da --stagione/--lega
+    comuni.add_argument('--cartella', default=None, help="cartella dei dati (default: cartella corrente)")
+    comuni.add_argument('--stagione', default='', help="stagione in stagioni/<nome> (default: la principale)")
+    comuni.add_argument('--lega', default='', help="lega in leghe/<nome> della stagione (default: la principale)")
+    comuni.add_argument('--tutte', action='store_true', help="voti: aggiorna tutte le leghe della stagione")
+    comuni.add_argument('--database', default=None)
+    comuni.add_argument('--storico', default=None)
+    comuni.add_argument('--statistiche', default=None, help="statistiche voti condivise dalle leghe della stagione")
+    comuni.add_argument('--forma', default=None, help="vista di forma dei giocatori della stagione")
+    comuni.add_argument('--file-rose', default=None)
+    comuni.add_argument('--alias', default=None, help="alias dei nomi della lega")
+    comuni.add_argument('--voti', default=None, help="cartella dei file Voti")
+    comuni.add_argument('--processi', type=int, default=None, help="processi per i file Voti (default: automatico)")
+    comuni.add_argument('--fixture', default=None, help="pagina HTML locale al posto delle probabili formazioni")
+    parser = argparse.ArgumentParser(prog="python -m fanta", description="Aggiornamento dati Fanta-Manager senza dashboard")
+    sotto = parser.add_subparsers(dest='comando', required=True)
+    for nome, esegui, aiuto in [
+        ('rose', comando_rose, "ricostruisce il database dal file Rose"),
+        ('voti', comando_voti, "ricalcola statistiche e storico dai file Voti"),
+        ('formazioni', comando_formazioni, "aggiorna i titolari dalle probabili formazioni"),
+        ('tutto', comando_tutto, "rose, voti e formazioni in fila"),
+    ]:
+        sotto.add_parser(nome, parents=[comuni], help=aiuto).set_defaults(esegui=esegui)
+    giornata = sotto.add_parser('giornata', parents=[comuni], help="aggiunge o sostituisce una sola giornata di voti")
+    giornata.add_argument('file', help="file Voti con 'Giornata_N' nel nome")
+    giornata.set_defaults(esegui=comando_giornata)
+    return parser
+
+def main(argv=None):
+    args = crea_parser().parse_args(argv)
+    if args.cartella: os.chdir(args.cartella)
+    ws = percorsi(args.stagione, args.lega)
+    for opzione, chiave in [('database', 'database'), ('storico', 'storico'), ('statistiche', 'statistiche'), ('forma', 'forma'),
+                            ('file_rose', 'rose'), ('alias', 'alias'), ('voti', 'voti')]:
+        if getattr(args, opzione) is None: setattr(args, opzione, ws[chiave])
+    try: return args.esegui(args)
+    except Exception as e:
+        print(f"Errore: {e}", file=sys.stderr)
+        return 1
@@ -0,0 +1,87 @@
+import os
+import pandas as pd
+import pyarrow as pa
+from fanta.asset import trova_logo_seriea, miniatura_base64, LATO_LOGO_TABELLA
+from fanta.profilo import cronometrato
+from fanta.persistenza import percorso_atomico
+
+# --- DATABASE GIOCATORI ---
+
+@cronometrato('check_database_integrity')
+def check_database_integrity(df):
+    cols_float = ['Media_Voto', 'Fanta_Media']
+    cols_int = ['Gol_Totali', 'Gol_Subiti', 'Partite_Giocate', 'Assist', 
+                'Ammonizioni', 'Espulsioni', 'Rigori_Segnati', 'Rigori_Sbagliati', 
+                'Rigori_Parati', 'Autoreti']
+    if 'Status_Probabile' not in df.columns: df['Status_Probabile'] = '?'
+    if df.empty: return df
+    
+    if 'Squadra_SerieA' in df.columns:
+        # Logo cercato e codificato una volta per club, non per riga
+        clubs = df['Squadra_SerieA'].drop_duplicates()
+        percorsi = {c: trova_logo_seriea(c) for c in clubs}
+        loghi = {c: miniatura_base64(p, LATO_LOGO_TABELLA) for c, p in percorsi.items()}
+        df['Path_Logo'] = df['Squadra_SerieA'].map(percorsi)
+        df['Logo_SerieA'] = df['Squadra_SerieA'].map(loghi)
+
+    for col in cols_float:
+        if col not in df.columns: df[col] = 0.0
+    for col in cols_int:
+        if col not in df.columns: df[col] = 0
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
+    return df
+
+def leggi_database(path):
+    if not os.path.exists(path): return pd.DataFrame()
+    return check_database_integrity(pd.read_csv(path))
+
+def salva_database(df, path):
+    # Il logo in base64 si ricava dal club a ogni lettura: su disco non serve
+    df = df.drop(columns=COLONNE_DERIVATE, errors='ignore')
+    with percorso_atomico(path, versiona=True) as temporaneo: df.to_csv(temporaneo, index=False)
+
+# --- RAPPRESENTAZIONE COMPATTA IN MEMORIA ---
+# Il database condiviso dalle sessioni della dashboard tiene le colonne ripetitive come
+# categorie (ogni logo una sola volta, le righe hanno solo il codice del club; st.dataframe
+# lo invia al browser come colonna a dizionario) e le statistiche nei tipi piu' stretti.
+# Chi scrive i dati (ingestione, CLI) continua a leggere il database con i tipi pieni.
+
+COLONNE_DERIVATE = ['Logo_SerieA']
+COLONNE_CATEGORIA = ['Ruolo', 'Squadra_SerieA', 'Fanta_Squadra', 'Path_Logo', 'Logo_SerieA']
+
+def compatta_database(df):
+    df = df.copy()
+    for col in COLONNE_CATEGORIA:
+        if col in df.columns: df[col] = df[col].astype('category')
+    for col in df.columns:
+        if pd.api.types.is_integer_dtype(df[col]) and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+        elif pd.api.types.is_float_dtype(df[col]): df[col] = df[col].astype('float32')
+    return df
+
+def espandi_database(df):
+    # Tipi pieni (object, int64, float64): il "prima" del rapporto sulla memoria
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype): df[col] = df[col].astype(object)
+        elif pd.api.types.is_integer_dtype(df[col]): df[col] = df[col].astype('int64')
+        elif pd.api.types.is_float_dtype(df[col]): df[col] = df[col].astype('float64')
+    return df
+
+def byte_memoria(df):
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+def byte_arrow(df):
+    # Quanto pesa la tabella serializzata come la invia st.dataframe
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.ipc.new_stream(sink, table.schema) as writer: writer.write_table(table)
+    return sink.getvalue().size
+
+def rapporto_memoria(tabelle):
+    # tabelle: {nome: (DataFrame, inviata al browser?)} -> byte prima e dopo la compattazione
+    righe = []
+    for nome, (df, inviata) in tabelle.items():
+        misura = byte_arrow if inviata else byte_memoria
+        righe.append({'Oggetto': nome, 'Prima KB': misura(espandi_database(df)) / 1024, 'Dopo KB': misura(df) / 1024})
+    return pd.DataFrame(righe)
@@ -0,0 +1,149 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fanta.nomi import nomi_voti, FILE_ALIAS_NOMI
+from fanta.profilo import cronometrato, registra_cache
+from fanta.persistenza import percorso_atomico
+
+# --- VISTE DI FORMA (MATERIALIZZATE) ---
+# Forma dei giocatori (per stagione) e totali per squadra e giornata (per lega) sono
+# salvati in parquet; nei metadati ci sono le giornate gia' applicate con la firma del
+# loro file voti. Una giornata nuova aggiorna solo i giocatori che hanno giocato (o solo
+# le righe di quella giornata); se una giornata gia' applicata cambia o sparisce, o se la
+# rosa della lega cambia, la vista si ricalcola da capo.
+
+FINESTRA_FORMA = 5
+CHIAVE_GIORNATE = b'fanta_giornate_applicate'
+CHIAVE_ROSA = b'fanta_firma_rosa'
+# fv_1 e' il fantavoto piu' recente, fv_N il piu' vecchio della finestra
+COLONNE_ULTIMI = [f'fv_{i}' for i in range(1, FINESTRA_FORMA + 1)]
+COLONNE_STATO = COLONNE_ULTIMI + ['somma_fv', 'presenze', 'serie', 'serie_max', 'ultima_giornata']
+
+def leggi_vista(path):
+    # (DataFrame, metadati) oppure (None, {}) se il file manca o non e' leggibile
+    if not path or not os.path.exists(path): return None, {}
+    try:
+        table = pq.read_table(path)
+        return table.to_pandas(), metadati_fanta(table.schema.metadata)
+    except Exception: return None, {}
+
+def metadati_vista(path):
+    # Solo lo schema: per sapere se la vista e' aggiornata senza leggerla
+    try: return metadati_fanta(pq.read_schema(path).metadata)
+    except Exception: return {}
+
+def metadati_fanta(metadati):
+    return {k: json.loads(v) for k, v in (metadati or {}).items() if k.startswith(b'fanta_')}
+
+def salva_vista(df, path, metadati):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta.update({k: json.dumps(v).encode('utf-8') for k, v in metadati.items()})
+    with percorso_atomico(path, versiona=True) as temporaneo: pq.write_table(table.replace_schema_metadata(meta), temporaneo)
+
+def giornate_applicate(path):
+    return metadati_vista(path).get(CHIAVE_GIORNATE)
+
+# --- FORMA DEI GIOCATORI (STAGIONE) ---
+def stato_vuoto(nomi=()):
+    stato = pd.DataFrame(np.nan, index=pd.Index(nomi, name='clean_name', dtype=object), columns=COLONNE_ULTIMI)
+    stato['somma_fv'] = 0.0
+    for col in ['presenze', 'serie', 'serie_max', 'ultima_giornata']: stato[col] = 0
+    return stato
+
+def applica_giornata(stato, numero, precedente, voti):
+    # Solo le righe dei giocatori con un voto nella giornata; la serie continua se
+    # avevano giocato anche la giornata applicata prima di questa
+    fv = voti.groupby('clean_name', sort=False)['Fantavoto'].mean()
+    nuovi = fv.index.difference(stato.index)
+    if len(nuovi): stato = pd.concat([stato, stato_vuoto(nuovi)])
+    righe = stato.loc[fv.index]
+    valori = fv.to_numpy(dtype=float)
+    ultimi = righe[COLONNE_ULTIMI].to_numpy()
+    serie = np.where(righe['ultima_giornata'].to_numpy() == precedente, righe['serie'].to_numpy() + 1, 1)
+    stato.loc[fv.index, COLONNE_ULTIMI] = np.column_stack([valori, ultimi[:, :-1]])
+    stato.loc[fv.index, 'somma_fv'] = righe['somma_fv'].to_numpy() + valori
+    stato.loc[fv.index, 'presenze'] = righe['presenze'].to_numpy() + 1
+    stato.loc[fv.index, 'serie'] = serie
+    stato.loc[fv.index, 'serie_max'] = np.maximum(righe['serie_max'].to_numpy(), serie)
+    stato.loc[fv.index, 'ultima_giornata'] = numero
+    return stato
+
+def colonne_forma(stato, ultima):
+    # Forma = fantamedia delle ultime FINESTRA_FORMA presenze; delta rispetto alla stagione;
+    # la serie in corso vale solo per chi ha giocato l'ultima giornata
+    vista = stato.reset_index()
+    ultimi = vista[COLONNE_ULTIMI].to_numpy()
+    contati = np.isfinite(ultimi).sum(axis=1)
+    vista['Forma'] = np.where(contati > 0, np.nansum(ultimi, axis=1) / np.maximum(contati, 1), np.nan)
+    vista['Delta_Forma'] = vista['Forma'] - vista['somma_fv'] / vista['presenze'].clip(lower=1)
+    vista['Serie_Presenze'] = vista['serie'].where(vista['ultima_giornata'] == ultima, 0)
+    return vista
+
+@cronometrato('aggiorna_forma')
+def aggiorna_forma(giornate, path):
+    # giornate: [(numero, firma del file voti, DataFrame clean_name/Fantavoto)]
+    giornate = sorted(giornate, key=lambda g: g[0])
+    attese = [[numero, firma] for numero, firma, _ in giornate]
+    vista, meta = leggi_vista(path)
+    applicate = meta.get(CHIAVE_GIORNATE, []) if vista is not None else []
+    da_capo = vista is None or attese[:len(applicate)] != applicate
+    registra_cache('forma', not da_capo and len(applicate) == len(attese))
+    if not da_capo and len(applicate) == len(attese): return vista
+    if da_capo: stato, applicate = stato_vuoto(), []
+    else: stato = vista.set_index('clean_name')[COLONNE_STATO]
+    precedente = applicate[-1][0] if applicate else None
+    for numero, _, voti in giornate[len(applicate):]:
+        stato = applica_giornata(stato, numero, precedente, voti)
+        precedente = numero
+    vista = colonne_forma(stato, precedente)
+    salva_vista(vista, path, {CHIAVE_GIORNATE: attese})
+    return vista
+
+def forma_giocatori(df, vista, path_alias=FILE_ALIAS_NOMI):
+    # Colonne di forma allineate al database della lega (NaN/0 per chi non ha voti)
+    nomi = nomi_voti(df['Giocatore'], df.get('Squadra_SerieA', pd.Series("", index=df.index)), path_alias)
+    forma = vista.drop_duplicates('clean_name').set_index('clean_name').reindex(nomi)
+    return pd.DataFrame({'Forma': forma['Forma'].to_numpy(), 'Delta_Forma': forma['Delta_Forma'].to_numpy(),
+                         'Serie_Presenze': forma['Serie_Presenze'].fillna(0).astype(int).to_numpy()}, index=df.index)
+
+# --- TOTALI PER SQUADRA E GIORNATA (LEGA) ---
+def rosa_voti(df, path_alias=FILE_ALIAS_NOMI):
+    nomi = nomi_voti(df['Giocatore'], df.get('Squadra_SerieA', pd.Series("", index=df.index)), path_alias)
+    return pd.Series(df['Fanta_Squadra'].to_numpy(), index=pd.Index(nomi.to_numpy(), name='clean_name'))
+
+def firma_rosa(rosa):
+    coppie = sorted(zip(rosa.index.astype(str), rosa.astype(str)))
+    return hashlib.sha1(json.dumps(coppie).encode('utf-8')).hexdigest()
+
+def totali_giornate(righe, rosa):
+    # Somma dei fantavoti di tutti i giocatori della rosa con un voto, per giornata
+    unite = righe[['clean_name', 'Giornata', 'Fantavoto']].merge(rosa.rename('Fanta_Squadra'), left_on='clean_name', right_index=True)
+    return (unite.groupby(['Fanta_Squadra', 'Giornata'], as_index=False)
+            .agg(Fantavoto_Totale=('Fantavoto', 'sum'), Presenti=('Fantavoto', 'count')))
+
+@cronometrato('aggiorna_totali_squadre')
+def aggiorna_totali_squadre(rosa, file_storico, file_forma, path):
+    # rosa: Series clean_name (come nello storico) -> Fanta_Squadra
+    attese = giornate_applicate(file_forma)
+    if attese is None or not os.path.exists(file_storico): return None
+    firma = firma_rosa(rosa)
+    vista, meta = leggi_vista(path)
+    applicate = meta.get(CHIAVE_GIORNATE, [])
+    da_capo = vista is None or meta.get(CHIAVE_ROSA) != firma or attese[:len(applicate)] != applicate
+    registra_cache('totali_squadre', not da_capo and len(applicate) == len(attese))
+    if not da_capo and len(applicate) == len(attese): return vista
+    if da_capo:
+        righe = pq.read_table(file_storico).to_pandas()
+        vista = totali_giornate(righe, rosa)
+    else:
+        nuove = [numero for numero, _ in attese[len(applicate):]]
+        righe = pq.read_table(file_storico, filters=[('Giornata', 'in', nuove)]).to_pandas()
+        vista = pd.concat([vista, totali_giornate(righe, rosa)], ignore_index=True)
+    vista = vista.sort_values(['Fanta_Squadra', 'Giornata'], kind='stable').reset_index(drop=True)
+    salva_vista(vista, path, {CHIAVE_GIORNATE: attese, CHIAVE_ROSA: firma})
+    return vista
@@ -0,0 +1,102 @@
+import os
+import re
+import json
+import time
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup
+from fanta.nomi import normalizza_nomi
+from fanta.profilo import cronometrato, registra_cache
+from fanta.persistenza import scrivi_atomico
+
+URL_PROBABILI = "https://www.gazzetta.it/Calcio/prob_form/"
+DIR_CACHE_FORMAZIONI = os.path.join('.fanta_cache', 'formazioni')
+TIMEOUT = (5, 20)  # connessione, lettura (secondi)
+
+# Sezioni della pagina che non riguardano i titolari: tolte fino a fine frase/riga
+RE_SEZIONI_ESCLUSE = re.compile(
+    r"(?:indisponibili|squalificati|ballottaggi|panchina|diffidati|disposizione in campo).*?(\.|\n|$)",
+    flags=re.DOTALL)
+RE_PAROLE = re.compile(r"[\w-]+")
+
+# --- SESSIONE HTTP ---
+# Una sola sessione per processo: riusa le connessioni e ritenta sugli errori temporanei
+_sessione = None
+
+def sessione_http():
+    global _sessione
+    if _sessione is None:
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+        _sessione = requests.Session()
+        _sessione.headers.update({'User-Agent': 'Mozilla/5.0'})
+        _sessione.mount("https://", HTTPAdapter(max_retries=retry))
+        _sessione.mount("http://", HTTPAdapter(max_retries=retry))
+    return _sessione
+
+# --- PAGINA E CACHE SU DISCO ---
+def pulisci_pagina(html):
+    # get_text(" ") separa i nodi HTML, cosi' nomi in tag diversi non restano attaccati
+    full_text = BeautifulSoup(html, 'html.parser').get_text(" ").lower()
+    return RE_SEZIONI_ESCLUSE.sub("", full_text)
+
+def leggi_cache_formazioni():
+    try:
+        with open(os.path.join(DIR_CACHE_FORMAZIONI, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(os.path.join(DIR_CACHE_FORMAZIONI, 'testo.txt'), encoding='utf-8') as f:
+            return meta, f.read()
+    except (OSError, ValueError): return {}, ""
+
+def salva_cache_formazioni(meta, html=None, testo=None):
+    # Con una risposta 304 si aggiornano solo i metadati
+    try:
+        if html is not None: scrivi_atomico(os.path.join(DIR_CACHE_FORMAZIONI, 'pagina.html'), html)
+        if testo is not None: scrivi_atomico(os.path.join(DIR_CACHE_FORMAZIONI, 'testo.txt'), testo)
+        scrivi_atomico(os.path.join(DIR_CACHE_FORMAZIONI, 'meta.json'), json.dumps(meta))
+    except OSError: pass
+
+@cronometrato('scraper')
+def scarica_probabili_formazioni(ttl=3600, fixture=None):
+    # fixture (o la variabile FANTA_PROBABILI_FIXTURE) indica una pagina HTML locale da usare
+    # al posto del sito, per lavorare offline.
+    fixture = fixture or os.environ.get('FANTA_PROBABILI_FIXTURE')
+    if fixture:
+        try:
+            with open(fixture, encoding='utf-8') as f:
+                return pulisci_pagina(f.read())
+        except OSError: return ""
+    meta, testo = leggi_cache_formazioni()
+    fresco = bool(testo) and time.time() - meta.get('scaricato', 0) < ttl
+    registra_cache('formazioni', fresco)
+    if fresco: return testo
+    headers = {}
+    if testo and meta.get('etag'): headers['If-None-Match'] = meta['etag']
+    if testo and meta.get('last_modified'): headers['If-Modified-Since'] = meta['last_modified']
+    try:
+        response = sessione_http().get(URL_PROBABILI, headers=headers, timeout=TIMEOUT)
+        if response.status_code == 304:
+            meta['scaricato'] = time.time()
+            salva_cache_formazioni(meta)
+            return testo
+        if response.status_code == 200:
+            testo = pulisci_pagina(response.text)
+            meta = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified'), 'scaricato': time.time()}
+            salva_cache_formazioni(meta, response.text, testo)
+            return testo
+    except requests.RequestException: pass
+    return testo
+
+# --- CONFRONTO NOMI ---
+def parole_pagina(testo):
+    # Insieme delle parole della pagina, normalizzate come i cognomi (senza punti e apostrofi)
+    return set(RE_PAROLE.findall(testo.replace(".", "").replace("'", "")))
+
+def tagga_titolari(giocatori, testo):
+    if not testo: return pd.Series("⚪", index=giocatori.index)
+    parole = parole_pagina(testo)
+    cognomi = normalizza_nomi(giocatori).str.split().str[-1].fillna("")
+    titolare = cognomi.isin(parole) & (cognomi.str.len() >= 3)
+    return pd.Series(np.where(titolare, "🟢", "⚪"), index=giocatori.index)
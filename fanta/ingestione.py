@@ -0,0 +1,57 @@
+from fanta.percorsi import FILE_DATABASE, FILE_ROSE_IMPORT
+from fanta.database import leggi_database, salva_database
+from fanta.rose import importa_rose
+from fanta.voti import corpus_voti, applica_corpus, aggiungi_giornata
+from fanta.forma import aggiorna_totali_squadre, rosa_voti
+from fanta.persistenza import blocco_dati
+from fanta.formazioni import scarica_probabili_formazioni, tagga_titolari
+
+# --- AGGIORNAMENTI DEL DATABASE ---
+# Le stesse operazioni dei pulsanti della sidebar, senza Streamlit: le usa la dashboard
+# e la riga di comando (python -m fanta), cosi' il lavoro pesante puo' girare da cron.
+# Ogni operazione legge e riscrive sotto blocco_dati: due aggiornamenti contemporanei
+# (due sessioni, o dashboard e cron) vanno in fila invece di sovrascriversi a vicenda.
+# Voti e giornate toccano file della stagione e della lega: i percorsi vanno sempre dati
+# (fanta.percorsi.percorsi), nessun default che ricada sul workspace principale.
+
+def ricostruisci_rose(file_rose=FILE_ROSE_IMPORT, file_database=FILE_DATABASE):
+    with blocco_dati():
+        nuovo = importa_rose(file_rose)
+        salva_database(nuovo, file_database)
+    return nuovo
+
+def ricostruisci_voti(file_database, directory, file_storico, processi=None, progresso=None, *,
+                      file_statistiche, path_alias, file_forma, file_totali):
+    with blocco_dati():
+        df = leggi_database(file_database)
+        if df.empty: return None
+        # Il corpus della stagione si analizza solo se i file Voti sono cambiati
+        stats = corpus_voti(directory, file_storico, file_statistiche, processi, progresso, file_forma)
+        aggiornato = applica_corpus(df, stats, path_alias)
+        salva_database(aggiornato, file_database)
+        aggiorna_totali_squadre(rosa_voti(aggiornato, path_alias), file_storico, file_forma, file_totali)
+    return aggiornato
+
+def carica_giornata(dati, nome_file, file_database, directory, file_storico, file_statistiche, path_alias, file_forma, file_totali):
+    # Una sola giornata nuova (o ricaricata): corpus aggiornato in modo incrementale,
+    # poi unione con la rosa della lega. Restituisce (numero, database o None se vuoto,
+    # nomi dei file della stessa giornata sostituiti). ValueError se il file e' illeggibile.
+    with blocco_dati():
+        numero, stats, sostituiti = aggiungi_giornata(dati, nome_file, directory, file_storico, file_statistiche, file_forma)
+        df = leggi_database(file_database)
+        if df.empty: return numero, None, sostituiti
+        aggiornato = applica_corpus(df, stats, path_alias)
+        salva_database(aggiornato, file_database)
+        aggiorna_totali_squadre(rosa_voti(aggiornato, path_alias), file_storico, file_forma, file_totali)
+    return numero, aggiornato, sostituiti
+
+def aggiorna_formazioni(file_database=FILE_DATABASE, fixture=None):
+    # None se la pagina non e' disponibile: il database resta com'e'
+    testo = scarica_probabili_formazioni(fixture=fixture)
+    if not testo: return None
+    with blocco_dati():
+        df = leggi_database(file_database)
+        if df.empty: return None
+        df['Status_Probabile'] = tagga_titolari(df['Giocatore'], testo)
+        salva_database(df, file_database)
+    return df
@@ -0,0 +1,117 @@
+import csv
+import openpyxl
+import pandas as pd
+from fanta.profilo import cronometrato
+
+try: import python_calamine
+except ImportError: python_calamine = None
+
+# --- LETTURA FILE ---
+
+# --- LETTURA IN STREAMING CON RICERCA DELL'INTESTAZIONE ---
+# Il file viene letto una sola volta, riga per riga: l'intestazione si cerca nelle prime
+# righe del flusso e il frame si costruisce solo con le colonne richieste.
+# Per gli xlsx si usa python-calamine se installato, altrimenti openpyxl in sola lettura.
+PAROLE_INTESTAZIONE = ['calciatore', 'nome', 'pos', 'squadra']
+RIGHE_RICERCA_INTESTAZIONE = 10
+
+def righe_csv(filepath):
+    with open(filepath, encoding='latin1', newline='') as f:
+        campione = f.read(8192)
+        f.seek(0)
+        try: dialetto = csv.Sniffer().sniff(campione, delimiters=',;\t|')
+        except csv.Error: dialetto = csv.excel
+        for riga in csv.reader(f, dialetto): yield [c if c != '' else None for c in riga]
+
+def cella_calamine(c):
+    # calamine restituisce '' per le celle vuote e float anche per gli interi
+    if c == '': return None
+    if isinstance(c, float) and c.is_integer(): return int(c)
+    return c
+
+def righe_excel(filepath):
+    if python_calamine is not None:
+        foglio = python_calamine.CalamineWorkbook.from_path(filepath).get_sheet_by_index(0)
+        for riga in foglio.iter_rows(): yield [cella_calamine(c) for c in riga]
+        return
+    wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        for riga in wb.worksheets[0].iter_rows(values_only=True): yield [c if c != '' else None for c in riga]
+    finally: wb.close()
+
+def nomi_colonne(intestazione):
+    # Come pandas: celle vuote -> 'Unnamed: i', doppioni -> 'nome.1', 'nome.2'
+    nomi, visti = [], {}
+    for i, c in enumerate(intestazione):
+        nome = f"Unnamed: {i}" if c is None else c
+        if nome in visti:
+            visti[nome] += 1
+            nome = f"{nome}.{visti[nome]}"
+        else: visti[nome] = 0
+        nomi.append(nome)
+    return nomi
+
+def numeri_da_testo(df):
+    # Nei CSV ogni cella e' testo: le colonne interamente numeriche diventano numeri
+    for col in df.columns:
+        convertita = pd.to_numeric(df[col], errors='coerce')
+        if convertita.notna().sum() == df[col].notna().sum(): df[col] = convertita
+    return df
+
+def leggi_foglio(filepath):
+    # Foglio grezzo, senza intestazione: per i file a blocchi (rose, calendario)
+    if filepath.endswith('.csv'):
+        return pd.read_csv(filepath, header=None, encoding='latin1', sep=None, engine='python')
+    vuota = float('nan')
+    righe = [[vuota if c is None else c for c in r] for r in righe_excel(filepath)]
+    while righe and all(c is vuota for c in righe[-1]): righe.pop()
+    return pd.DataFrame(righe)
+
+@cronometrato('leggi_excel_intelligente')
+def leggi_excel_intelligente(filepath, colonne=None):
+    # colonne: nomi (minuscoli) da tenere; la prima colonna resta sempre, serve a chi
+    # riconosce le righe di separazione tra blocchi (es. il club nei file voti)
+    try:
+        righe = righe_csv(filepath) if filepath.endswith('.csv') else righe_excel(filepath)
+        iniziali = []
+        intestazione = None
+        for riga in righe:
+            riga = list(riga)
+            if any(c is not None and str(c).lower() in PAROLE_INTESTAZIONE for c in riga):
+                intestazione = riga
+                break
+            iniziali.append(riga)
+            if len(iniziali) >= RIGHE_RICERCA_INTESTAZIONE: break
+        sopra = None
+        if intestazione is None:
+            # Nessuna intestazione riconosciuta: prima riga come intestazione
+            if not iniziali: return pd.DataFrame()
+            intestazione, dati = iniziali[0], iniziali[1:]
+        else:
+            dati = []
+            if iniziali: sopra = next((c for c in iniziali[-1] if c is not None), None)
+        nomi = nomi_colonne(intestazione)
+        if colonne is not None:
+            # Indici dall'intestazione; di ogni riga si tengono solo quelle celle, mentre si
+            # legge: la memoria segue le colonne richieste, non la larghezza del foglio
+            tenute = [i for i, n in enumerate(nomi) if i == 0 or str(n).strip().lower() in colonne]
+            nomi = [nomi[i] for i in tenute]
+            dati = [[riga[i] if i < len(riga) else None for i in tenute] for riga in dati]
+            for riga in righe: dati.append([riga[i] if i < len(riga) else None for i in tenute])
+        else:
+            larghezza = len(nomi)
+            for riga in righe:
+                if len(riga) > larghezza:
+                    # Celle oltre l'intestazione: nuove colonne senza nome, come in pandas
+                    nomi += [f"Unnamed: {i}" for i in range(larghezza, len(riga))]
+                    larghezza = len(riga)
+                dati.append(riga)
+        # Via le righe vuote in fondo al foglio
+        while dati and all(c is None for c in dati[-1]): dati.pop()
+        vuota = float('nan')
+        df = pd.DataFrame([[riga[i] if i < len(riga) and riga[i] is not None else vuota for i in range(len(nomi))] for riga in dati], columns=nomi)
+        if filepath.endswith('.csv'): df = numeri_da_testo(df)
+        # Testo subito sopra l'intestazione (nei file voti e' il club del primo blocco)
+        if sopra is not None: df.attrs['sopra_intestazione'] = sopra
+        return df
+    except Exception: return None
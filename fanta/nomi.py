@@ -0,0 +1,139 @@
+import os
+import json
+import difflib
+from collections import defaultdict
+import pandas as pd
+from fanta.persistenza import scrivi_atomico
+
+FILE_ALIAS_NOMI = os.path.join('.fanta_cache', 'alias_nomi.json')
+SOGLIA_SOMIGLIANZA = 0.8
+
+# --- MAPPA SIGLE EXCEL -> NOMI FILE ---
+MAPPA_SERIE_A = {
+    'Int': 'inter', 'Mil': 'milan', 'Juv': 'juventus', 'Nap': 'napoli', 'Rom': 'roma',
+    'Laz': 'lazio', 'Ata': 'atalanta', 'Fio': 'fiorentina', 'Bol': 'bologna', 'Tor': 'torino',
+    'Udi': 'udinese', 'Gen': 'genoa', 'Ver': 'verona', 'Lec': 'lecce', 'Emp': 'empoli',
+    'Mon': 'monza', 'Cag': 'cagliari', 'Sal': 'salernitana', 'Sas': 'sassuolo', 'Fro': 'frosinone',
+    'Par': 'parma', 'Com': 'como', 'Ven': 'venezia', 'Cre': 'cremonese', 'Spe': 'spezia',
+    'Pis': 'pisa', 'Bar': 'bari', 'Sam': 'sampdoria'
+}
+
+# --- NORMALIZZAZIONE NOMI ---
+
+def normalizza_nome(nome):
+    if pd.isna(nome): return ""
+    return str(nome).lower().strip().replace(".", "").replace("'", "")
+
+def normalizza_per_confronto_web(nome):
+    if pd.isna(nome): return ""
+    n = str(nome).lower().strip().replace(".", "").replace("'", "")
+    parole = n.split()
+    return parole[-1] if len(parole) > 0 else n
+
+def normalizza_nomi(serie):
+    # Versione vettoriale di normalizza_nome per intere colonne
+    pulita = serie.astype(str).str.lower().str.strip().str.replace(".", "", regex=False).str.replace("'", "", regex=False)
+    return pulita.where(serie.notna(), "")
+
+def normalizza_club(club):
+    # Sigla delle rose ('Ata') o nome esteso dei file voti ('Atalanta') -> 'atalanta'
+    if pd.isna(club): return ""
+    c = str(club).strip()
+    return MAPPA_SERIE_A.get(c.capitalize(), c.lower())
+
+def parole_chiave(nome_clean, lunghezza_min=3):
+    return [p for p in nome_clean.replace("-", " ").split() if len(p) >= lunghezza_min]
+
+# --- RISOLUZIONE NOMI ROSE -> VOTI ---
+# I giocatori presenti nei voti (identita', indicizzate per chiave statistica con colonne
+# clean_name e squadra) finiscono in blocchi (club, parola del nome): un nome della rosa
+# che non coincide esattamente viene confrontato solo con i candidati dei suoi blocchi.
+# Gli abbinamenti trovati sono salvati in FILE_ALIAS_NOMI (modificabile a mano) e riusati
+# quando il nome non coincide con nessuno dei voti.
+_alias = {}
+
+def carica_alias(path=FILE_ALIAS_NOMI):
+    try: versione = os.stat(path).st_mtime_ns
+    except OSError: return {'alias': {}, 'non_trovati': []}
+    if path in _alias and _alias[path][0] == versione: return _alias[path][1]
+    try:
+        with open(path, encoding='utf-8') as f:
+            alias = json.load(f)
+    except (OSError, ValueError): alias = {}
+    alias.setdefault('alias', {})
+    alias.setdefault('non_trovati', [])
+    _alias[path] = (versione, alias)
+    return alias
+
+def salva_alias(alias, path=FILE_ALIAS_NOMI):
+    # La cache in memoria (letta da tutte le sessioni) cambia solo se il file e' stato scritto
+    try:
+        scrivi_atomico(path, json.dumps(alias, ensure_ascii=False, indent=1))
+        _alias[path] = (os.stat(path).st_mtime_ns, alias)
+    except OSError: return False
+    return True
+
+def indicizza_esatti(identita):
+    esatti = defaultdict(list)
+    for chiave, nome, club in zip(identita.index, identita['clean_name'], identita['squadra']): esatti[nome].append((chiave, club))
+    return esatti
+
+def indicizza_blocchi(identita):
+    blocchi = defaultdict(list)
+    for chiave, nome, club in zip(identita.index, identita['clean_name'], identita['squadra']):
+        for p in parole_chiave(nome): blocchi[(club, p)].append((chiave, nome))
+    return blocchi
+
+def abbinamento_esatto(omonimi, club):
+    # Stesso clean_name: l'unico, o l'unico dello stesso club (None se ambiguo)
+    if len(omonimi) == 1: return omonimi[0][0]
+    stesso_club = [k for k, c in omonimi if c == club]
+    return stesso_club[0] if len(stesso_club) == 1 else None
+
+def abbinamento_simile(nome, club, blocchi):
+    if not club: return None
+    candidati = {k: n for p in parole_chiave(nome) for k, n in blocchi.get((club, p), [])}
+    punteggi = sorted(((difflib.SequenceMatcher(None, nome, n).ratio(), k) for k, n in candidati.items()), reverse=True)
+    if not punteggi or punteggi[0][0] < SOGLIA_SOMIGLIANZA: return None
+    if len(punteggi) > 1 and punteggi[1][0] == punteggi[0][0]: return None
+    return punteggi[0][1]
+
+def chiave_rosa(nome, club):
+    return f"{nome}|{club}"
+
+def risolvi_nomi(giocatori, clubs, identita, path_alias=FILE_ALIAS_NOMI):
+    # Restituisce per ogni giocatore la chiave di identita (None se non presente nei voti).
+    # Si lavora su una copia: il dizionario in cache e' condiviso con le altre sessioni.
+    letti = carica_alias(path_alias)
+    alias = {'alias': dict(letti['alias']), 'non_trovati': list(letti['non_trovati'])}
+    # Prima il nome esatto, poi l'alias salvato, infine il nome piu' simile nei blocchi
+    esatti = indicizza_esatti(identita)
+    blocchi = None
+    chiavi = []
+    for nome, club in zip(normalizza_nomi(giocatori), clubs.map(normalizza_club)):
+        omonimi = esatti.get(nome)
+        chiave = abbinamento_esatto(omonimi, club) if omonimi else None
+        if chiave is None:
+            chiave = alias['alias'].get(chiave_rosa(nome, club))
+            if chiave is not None and chiave not in identita.index: chiave = None
+        if chiave is None and not omonimi:
+            if blocchi is None: blocchi = indicizza_blocchi(identita)
+            chiave = abbinamento_simile(nome, club, blocchi)
+        if chiave is not None: alias['alias'][chiave_rosa(nome, club)] = chiave
+        chiavi.append(chiave)
+    alias['non_trovati'] = [g for g, k in zip(giocatori, chiavi) if k is None]
+    salva_alias(alias, path_alias)
+    return pd.Series(chiavi, index=giocatori.index, dtype=object)
+
+def nome_voti(giocatore, club, path_alias=FILE_ALIAS_NOMI):
+    # clean_name con cui il giocatore compare nei voti (e nello storico)
+    nome = normalizza_nome(giocatore)
+    chiave = carica_alias(path_alias)['alias'].get(chiave_rosa(nome, normalizza_club(club)))
+    return chiave.split('|')[0] if chiave else nome
+
+def nomi_voti(giocatori, clubs, path_alias=FILE_ALIAS_NOMI):
+    # Versione vettoriale di nome_voti per intere colonne
+    alias = carica_alias(path_alias)['alias']
+    nomi = normalizza_nomi(giocatori)
+    chiavi = [alias.get(chiave_rosa(n, normalizza_club(c))) for n, c in zip(nomi, clubs)]
+    return pd.Series([k.split('|')[0] if k else n for k, n in zip(chiavi, nomi)], index=giocatori.index, dtype=object)
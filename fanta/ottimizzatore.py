@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+from fanta.profilo import cronometrato
+
+# --- FORMAZIONE CONSIGLIATA ---
+# Per ogni squadra e modulo l'undici migliore e' il portiere migliore piu' i migliori
+# difensori, centrocampisti e attaccanti per punteggio: basta ordinare una volta per
+# (squadra, ruolo) e sommare i primi k. Tutte le squadre e tutti i moduli insieme, senza
+# provare combinazioni. Chi resta fuori va in panchina, ordinato per ruolo e punteggio.
+
+MODULI = {
+    '3-4-3': (3, 4, 3), '3-5-2': (3, 5, 2), '4-3-3': (4, 3, 3), '4-4-2': (4, 4, 2),
+    '4-5-1': (4, 5, 1), '5-3-2': (5, 3, 2), '5-4-1': (5, 4, 1),
+}
+RUOLI_FORMAZIONE = ['P', 'D', 'C', 'A']
+# Peso del punteggio secondo le probabili formazioni ('?' = non ancora scaricate)
+PESO_STATUS = {'🟢': 1.0, '⚪': 0.25}
+
+def punteggio_proiezione(df):
+    return df['Fanta_Media'].astype(float) * df['Status_Probabile'].map(PESO_STATUS).fillna(1.0)
+
+def punteggio_forma(df, forma):
+    # Forma delle ultime presenze; chi non ne ha usa la fantamedia stagionale
+    base = forma['Forma'].fillna(df['Fanta_Media']).astype(float)
+    return base * df['Status_Probabile'].map(PESO_STATUS).fillna(1.0)
+
+@cronometrato('ottimizza_formazioni')
+def ottimizza_formazioni(df, punteggio):
+    # Restituisce (totali squadra x modulo, modulo migliore per squadra, DataFrame allineato
+    # a df con Titolare e Ordine); totale -inf se la rosa non basta per il modulo
+    moduli = np.array([(1,) + m for m in MODULI.values()])
+    k_max = moduli.max() + 1
+    d = pd.DataFrame({'squadra': df['Fanta_Squadra'], 'ruolo': df['Ruolo'].map({r: i for i, r in enumerate(RUOLI_FORMAZIONE)}),
+                      'punti': punteggio.fillna(0).astype(float)}).dropna(subset=['ruolo'])
+    d['ruolo'] = d['ruolo'].astype(int)
+    d = d.sort_values(['squadra', 'ruolo', 'punti'], ascending=[True, True, False], kind='stable')
+    gruppi = d.groupby(['squadra', 'ruolo'], sort=False)
+    rango = gruppi.cumcount().to_numpy()
+    cumulata = gruppi['punti'].cumsum().to_numpy()
+    cod_squadra, squadre = pd.factorize(d['squadra'], sort=True)
+    ruolo = d['ruolo'].to_numpy()
+
+    # somme[s, r, k] = somma dei migliori k giocatori del ruolo r nella squadra s
+    somme = np.full((len(squadre), len(RUOLI_FORMAZIONE), k_max), -np.inf)
+    somme[:, :, 0] = 0.0
+    entro = rango < k_max - 1
+    somme[cod_squadra[entro], ruolo[entro], rango[entro] + 1] = cumulata[entro]
+    totali = somme[:, np.arange(len(RUOLI_FORMAZIONE)), moduli].sum(axis=2)
+    migliore = totali.argmax(axis=1)
+
+    titolare = rango < moduli[migliore[cod_squadra], ruolo]
+    titolare &= np.isfinite(totali[cod_squadra, migliore[cod_squadra]])
+    d['Titolare'] = titolare
+    # Titolari prima, poi la panchina: entrambi per ruolo e punteggio
+    d['Ordine'] = d.assign(panchina=~titolare).sort_values(['squadra', 'panchina', 'ruolo', 'punti'], ascending=[True, True, True, False], kind='stable').groupby('squadra').cumcount()
+    nomi_moduli = list(MODULI)
+    return (pd.DataFrame(totali, index=squadre, columns=nomi_moduli),
+            pd.Series([nomi_moduli[m] for m in migliore], index=squadre),
+            d[['Titolare', 'Ordine']].reindex(df.index))
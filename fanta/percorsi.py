@@ -0,0 +1,63 @@
+import os
+import re
+from fanta.nomi import FILE_ALIAS_NOMI
+
+# --- FILE DELLA DASHBOARD ---
+# Percorsi relativi alla cartella di lavoro (quella di app.py), condivisi da dashboard e CLI
+FILE_DATABASE = 'fanta_database.csv'
+FILE_HISTORY = 'fanta_history.parquet'
+FILE_HISTORY_CSV = 'fanta_history.csv'
+FILE_STATISTICHE_VOTI = 'fanta_statistiche_voti.parquet'
+FILE_FORMA = 'fanta_forma.parquet'
+FILE_TOTALI_SQUADRE = 'fanta_totali_squadre.parquet'
+FILE_ROSE_IMPORT = 'Rose_fantawotblitz.xlsx'
+FILE_CLASSIFICA = 'Classifica_Campionato.xlsx'
+FILE_CALENDARIO = 'Calendario_Campionato.xlsx'
+FILE_REGOLE = 'regole_punteggio.json'
+DIR_VOTI = 'Voti'
+
+# --- STAGIONI E LEGHE ---
+# La stagione principale e' la cartella di lavoro, le altre stanno in stagioni/<nome>.
+# Voti, storico, statistiche e forma sono della stagione e condivisi da tutte le sue leghe;
+# la lega principale usa i file nella cartella della stagione, le altre leghe/<nome>
+# con gli stessi nomi di file (rose, classifica, calendario, database, alias, totali, regole).
+DIR_STAGIONI = 'stagioni'
+DIR_LEGHE = 'leghe'
+FILE_ALIAS_LEGA = 'alias_nomi.json'
+RE_NOME_VALIDO = re.compile(r"^[\w][\w .-]*$")
+
+def percorsi(stagione='', lega=''):
+    base_stagione = os.path.join(DIR_STAGIONI, stagione) if stagione else ''
+    base_lega = os.path.join(base_stagione, DIR_LEGHE, lega) if lega else base_stagione
+    return {
+        'stagione': stagione, 'lega': lega, 'cartella_lega': base_lega,
+        'voti': os.path.join(base_stagione, DIR_VOTI),
+        'storico': os.path.join(base_stagione, FILE_HISTORY),
+        'storico_csv': os.path.join(base_stagione, FILE_HISTORY_CSV),
+        'statistiche': os.path.join(base_stagione, FILE_STATISTICHE_VOTI),
+        'forma': os.path.join(base_stagione, FILE_FORMA),
+        'database': os.path.join(base_lega, FILE_DATABASE),
+        'rose': os.path.join(base_lega, FILE_ROSE_IMPORT),
+        'classifica': os.path.join(base_lega, FILE_CLASSIFICA),
+        'calendario': os.path.join(base_lega, FILE_CALENDARIO),
+        'totali_squadre': os.path.join(base_lega, FILE_TOTALI_SQUADRE),
+        'regole': os.path.join(base_lega, FILE_REGOLE),
+        'alias': os.path.join(base_lega, FILE_ALIAS_LEGA) if base_lega else FILE_ALIAS_NOMI,
+    }
+
+def sottocartelle(directory):
+    try: return sorted(d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d)))
+    except OSError: return []
+
+def elenca_stagioni():
+    return [''] + sottocartelle(DIR_STAGIONI)
+
+def elenca_leghe(stagione=''):
+    return [''] + sottocartelle(os.path.join(percorsi(stagione)['cartella_lega'], DIR_LEGHE))
+
+def crea_lega(nome, stagione=''):
+    nome = nome.strip()
+    if not RE_NOME_VALIDO.match(nome): raise ValueError(f"Nome lega non valido: '{nome}'")
+    cartella = percorsi(stagione, nome)['cartella_lega']
+    os.makedirs(cartella, exist_ok=True)
+    return nome
@@ -0,0 +1,125 @@
+import os
+import json
+import stat
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# --- SCRITTURE ATOMICHE, BLOCCO E VERSIONE DEI DATI ---
+# Ogni file si scrive in un temporaneo nella stessa cartella e poi si rinomina sul
+# definitivo: chi legge vede il file vecchio o quello nuovo, mai uno a meta'. Le azioni che
+# leggono e riscrivono i dati (sidebar, CLI) girano sotto un blocco su file valido fra
+# processi e fra sessioni. A ogni scrittura di un file di dati cresce un contatore: la
+# firma (contatore, mtime, dimensione) cambia anche se due scritture cadono nello stesso
+# istante con la stessa dimensione, e le cache in lettura si rinnovano da sole.
+
+FILE_BLOCCO = os.path.join('.fanta_cache', 'dati.lock')
+FILE_VERSIONI = os.path.join('.fanta_cache', 'versioni_dati.json')
+ATTESA_BLOCCO = 60
+
+if os.name == 'nt':
+    import msvcrt
+    def prova_blocco(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    def rilascia_blocco(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+    def prova_blocco(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    def rilascia_blocco(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+# Profondita' del blocco per thread: chi lo tiene gia' puo' richiederlo di nuovo
+_locale = threading.local()
+
+@contextmanager
+def blocco_dati(attesa=ATTESA_BLOCCO, path=FILE_BLOCCO):
+    if getattr(_locale, 'profondita', 0):
+        _locale.profondita += 1
+        try: yield
+        finally: _locale.profondita -= 1
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a+b') as f:
+        scadenza = time.monotonic() + attesa
+        while True:
+            try:
+                prova_blocco(f)
+                break
+            except OSError:
+                if time.monotonic() > scadenza: raise TimeoutError(f"Dati occupati da un'altra sessione da oltre {attesa} s")
+                time.sleep(0.05)
+        _locale.profondita = 1
+        try: yield
+        finally:
+            _locale.profondita = 0
+            rilascia_blocco(f)
+
+def sostituisci(sorgente, destinazione, tentativi=20):
+    # Su Windows la rinomina fallisce se qualcuno ha il file aperto: si riprova per un po'
+    for i in range(tentativi):
+        try: return os.replace(sorgente, destinazione)
+        except PermissionError:
+            if i == tentativi - 1: raise
+            time.sleep(0.05)
+
+@contextmanager
+def percorso_atomico(path, versiona=False, suffisso='.tmp'):
+    # Restituisce un percorso temporaneo da scrivere; a blocco chiuso senza errori
+    # diventa path. Con versiona=True il file conta come dato e ne cresce la versione.
+    # Il temporaneo e' un file nascosto (inizia con '.'): i glob non lo vedono.
+    cartella = os.path.dirname(path) or '.'
+    os.makedirs(cartella, exist_ok=True)
+    descrittore, temporaneo = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix=suffisso, dir=cartella)
+    os.close(descrittore)
+    # mkstemp crea il file leggibile solo dal proprietario: si tengono i permessi di prima
+    try: os.chmod(temporaneo, stat.S_IMODE(os.stat(path).st_mode) if os.path.exists(path) else 0o644)
+    except OSError: pass
+    try:
+        yield temporaneo
+        if versiona:
+            with blocco_dati():
+                sostituisci(temporaneo, path)
+                incrementa_versione(path)
+        else: sostituisci(temporaneo, path)
+    finally:
+        if os.path.exists(temporaneo): os.remove(temporaneo)
+
+def scrivi_atomico(path, dati, versiona=False):
+    # bytes o str (utf-8)
+    with percorso_atomico(path, versiona) as temporaneo:
+        with open(temporaneo, 'wb') as f:
+            f.write(dati.encode('utf-8') if isinstance(dati, str) else dati)
+
+# --- VERSIONE DEI DATI ---
+def leggi_versioni():
+    try:
+        with open(FILE_VERSIONI, encoding='utf-8') as f: versioni = json.load(f)
+    except (OSError, ValueError): versioni = {}
+    versioni.setdefault('versione', 0)
+    versioni.setdefault('file', {})
+    return versioni
+
+def incrementa_versione(path):
+    # Da chiamare sotto blocco_dati: il contatore e' unico e non torna mai indietro
+    versioni = leggi_versioni()
+    versioni['versione'] += 1
+    versioni['file'][os.path.abspath(path)] = versioni['versione']
+    scrivi_atomico(FILE_VERSIONI, json.dumps(versioni))
+    return versioni['versione']
+
+def versione_dati(path=None):
+    # Ultima versione scritta di path (0 se mai scritto da qui); senza path quella globale
+    versioni = leggi_versioni()
+    if path is None: return versioni['versione']
+    return versioni['file'].get(os.path.abspath(path), 0)
+
+def firma_dati(path):
+    # (versione, mtime, dimensione) oppure None se il file non c'e'
+    try: info = os.stat(path)
+    except OSError: return None
+    return (versione_dati(path), info.st_mtime_ns, info.st_size)
@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+FILE_LOG_PROFILO = os.path.join('.fanta_cache', 'profilo.jsonl')
+# Tempo massimo lato server per le sezioni disegnate in un solo blocco (ms)
+BUDGET_MS = {'render_ultimo_turno': 30, 'render_classifica': 60}
+
+# --- PROFILO PER RERUN ---
+# Ogni rerun (un thread dello script) raccoglie tempi e chiamate per fase e
+# chiamate/mancati per cache. Fuori da un rerun (CLI, benchmark) non si registra nulla.
+_corrente = threading.local()
+
+def inizia_rerun():
+    _corrente.rerun = {'inizio': time.perf_counter(), 'fasi': {}, 'cache': {}}
+
+def rerun_corrente():
+    return getattr(_corrente, 'rerun', None)
+
+@contextmanager
+def fase(nome):
+    rerun = rerun_corrente()
+    if rerun is None:
+        yield
+        return
+    inizio = time.perf_counter()
+    try: yield
+    finally:
+        voce = rerun['fasi'].setdefault(nome, {'secondi': 0.0, 'chiamate': 0})
+        voce['secondi'] += time.perf_counter() - inizio
+        voce['chiamate'] += 1
+
+def cronometrato(nome):
+    def decoratore(funzione):
+        @wraps(funzione)
+        def wrapper(*args, **kwargs):
+            with fase(nome): return funzione(*args, **kwargs)
+        return wrapper
+    return decoratore
+
+def registra_cache(nome, trovato):
+    rerun = rerun_corrente()
+    if rerun is None: return
+    voce = rerun['cache'].setdefault(nome, {'chiamate': 0, 'mancati': 0})
+    voce['chiamate'] += 1
+    if not trovato: voce['mancati'] += 1
+
+def cache_mancata(nome):
+    # Per le cache dove si vede solo il mancato (corpo della funzione in cache): chi chiama
+    # registra la chiamata come trovata, il corpo la corregge in mancata
+    rerun = rerun_corrente()
+    if rerun is None: return
+    voce = rerun['cache'].setdefault(nome, {'chiamate': 0, 'mancati': 0})
+    voce['mancati'] += 1
+
+# --- RIEPILOGO E LOG ---
+def riepilogo(rerun):
+    return {
+        'quando': datetime.now().isoformat(timespec='seconds'),
+        'totale_ms': round((time.perf_counter() - rerun['inizio']) * 1000, 1),
+        'fasi': {n: {'ms': round(v['secondi'] * 1000, 1), 'chiamate': v['chiamate'], 'budget_ms': BUDGET_MS.get(n)} for n, v in rerun['fasi'].items()},
+        'fuori_budget': [n for n, v in rerun['fasi'].items() if n in BUDGET_MS and v['secondi'] * 1000 > BUDGET_MS[n]],
+        'cache': {n: {'chiamate': v['chiamate'], 'trovati': v['chiamate'] - v['mancati'],
+                      'hit_rate': round(1 - v['mancati'] / v['chiamate'], 3) if v['chiamate'] else None}
+                  for n, v in rerun['cache'].items()},
+    }
+
+_logger = None
+
+def logger_profilo(path=FILE_LOG_PROFILO):
+    # Una riga JSON per rerun; il file ruota a 1 MB tenendo 5 copie
+    global _logger
+    if _logger is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        gestore = RotatingFileHandler(path, maxBytes=2**20, backupCount=5, encoding='utf-8')
+        gestore.setFormatter(logging.Formatter('%(message)s'))
+        _logger = logging.getLogger('fanta.profilo')
+        _logger.setLevel(logging.INFO)
+        _logger.propagate = False
+        _logger.addHandler(gestore)
+    return _logger
+
+def chiudi_rerun(path=FILE_LOG_PROFILO):
+    rerun = rerun_corrente()
+    if rerun is None: return None
+    _corrente.rerun = None
+    dati = riepilogo(rerun)
+    try: logger_profilo(path).info(json.dumps(dati, ensure_ascii=False))
+    except OSError: pass
+    return dati
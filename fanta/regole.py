@@ -0,0 +1,72 @@
+import json
+import numpy as np
+import pandas as pd
+from fanta.persistenza import scrivi_atomico, blocco_dati
+
+# --- REGOLE DI PUNTEGGIO ---
+# Il fantavoto e' il voto piu' i conteggi degli eventi della giornata per un vettore di
+# pesi. Le regole sono dati: quelle standard sono qui, ogni lega puo' aggiungerne altre in
+# regole_punteggio.json ({nome: {evento: peso}}, gli eventi non indicati pesano come nelle
+# standard). Piu' regole insieme sono una matrice eventi x regole: un solo prodotto da' i
+# fantavoti di tutte, sullo storico o sulle somme della stagione, senza rileggere i Voti.
+
+EVENTI = ['gf', 'rf', 'rp', 'ass', 'gs', 'au', 'rs', 'amm', 'esp']
+NOMI_EVENTI = {'gf': 'Gol', 'rf': 'Rigore segnato', 'rp': 'Rigore parato', 'ass': 'Assist', 'gs': 'Gol subito',
+               'au': 'Autogol', 'rs': 'Rigore sbagliato', 'amm': 'Ammonizione', 'esp': 'Espulsione'}
+REGOLA_STANDARD = 'Standard'
+PESI_STANDARD = {'gf': 3, 'rf': 3, 'rp': 3, 'ass': 1, 'gs': -1, 'au': -2, 'rs': -3, 'amm': -0.5, 'esp': -1}
+# Dove sono i conteggi degli eventi nello storico e nel database della lega
+COLONNE_STORICO = {'gf': 'Gol', 'rf': 'Rig.Fatti', 'rp': 'Rig.Par', 'ass': 'Assist', 'gs': 'Gs',
+                   'au': 'Aut', 'rs': 'Rig.Sba', 'amm': 'Amm', 'esp': 'Esp'}
+COLONNE_DATABASE = {'gf': 'Gol_Totali', 'rf': 'Rigori_Segnati', 'rp': 'Rigori_Parati', 'ass': 'Assist', 'gs': 'Gol_Subiti',
+                    'au': 'Autoreti', 'rs': 'Rigori_Sbagliati', 'amm': 'Ammonizioni', 'esp': 'Espulsioni'}
+
+def matrice_pesi(regole):
+    # regole: {nome: {evento: peso}} -> matrice eventi x regole
+    return np.array([[float(pesi.get(e, 0)) for pesi in regole.values()] for e in EVENTI]).reshape(len(EVENTI), len(regole))
+
+def conteggi_eventi(df, colonne=None):
+    # Matrice righe x eventi (colonna mancante = evento mai avvenuto)
+    colonne = colonne or {e: e for e in EVENTI}
+    return np.column_stack([pd.to_numeric(df[colonne[e]], errors='coerce').fillna(0).to_numpy(dtype=float) if colonne[e] in df.columns
+                            else np.zeros(len(df)) for e in EVENTI]).reshape(len(df), len(EVENTI))
+
+def fantavoti(voti, df, regole, colonne=None):
+    # DataFrame righe x regole: voto + conteggi degli eventi per i pesi di ogni regola
+    valori = np.asarray(voti, dtype=float)[:, None] + conteggi_eventi(df, colonne) @ matrice_pesi(regole)
+    return pd.DataFrame(valori, index=df.index, columns=list(regole))
+
+def fantavoti_storico(storico, regole):
+    return fantavoti(storico['Voto'], storico, regole, COLONNE_STORICO)
+
+def fanta_medie(df, regole):
+    # Fantamedia stagionale per regola dalle somme nel database della lega:
+    # media voto + eventi della stagione x pesi / presenze (0 per chi non ha presenze)
+    presenze = df['Partite_Giocate'].to_numpy(dtype=float)[:, None]
+    bonus = conteggi_eventi(df, COLONNE_DATABASE) @ matrice_pesi(regole)
+    medie = df['Media_Voto'].to_numpy(dtype=float)[:, None] + bonus / np.maximum(presenze, 1)
+    return pd.DataFrame(np.where(presenze > 0, medie, 0.0), index=df.index, columns=list(regole))
+
+# --- REGOLE DELLA LEGA ---
+def leggi_file_regole(path):
+    try:
+        with open(path, encoding='utf-8') as f: salvate = json.load(f)
+    except (OSError, ValueError): return {}
+    return salvate if isinstance(salvate, dict) else {}
+
+def leggi_regole(path):
+    # Standard piu' le regole salvate per la lega (che possono anche ridefinire la standard)
+    regole = {REGOLA_STANDARD: dict(PESI_STANDARD)}
+    for nome, pesi in leggi_file_regole(path).items():
+        if isinstance(pesi, dict): regole[str(nome)] = {e: float(pesi.get(e, PESI_STANDARD[e])) for e in EVENTI}
+    return regole
+
+def salva_regola(nome, pesi, path):
+    # Aggiunge o sostituisce una regola nel file della lega
+    nome = nome.strip()
+    if not nome: raise ValueError("Nome regola mancante")
+    with blocco_dati():
+        salvate = leggi_file_regole(path)
+        salvate[nome] = {e: float(pesi.get(e, PESI_STANDARD[e])) for e in EVENTI}
+        scrivi_atomico(path, json.dumps(salvate, ensure_ascii=False, indent=1), versiona=True)
+    return nome
@@ -0,0 +1,50 @@
+from html import escape
+import pandas as pd
+from fanta.asset import trova_logo_fanta, miniatura_base64
+
+# --- RENDERING IN UN SOLO BLOCCO ---
+# Classifica e card delle partite costruite in un colpo solo (una tabella / un blocco
+# HTML) invece che con colonne e widget per ogni cella: un solo delta per sezione.
+# I loghi sono miniature base64 in cache, inserite direttamente nell'HTML.
+
+def logo_squadra(squadra):
+    return miniatura_base64(trova_logo_fanta(squadra))
+
+def html_squadra_card(squadra):
+    logo = logo_squadra(squadra)
+    img = f"<img src='{logo}' style='width:30px; height:30px; object-fit:contain'>" if logo else ""
+    return f"<div style='width:30%; text-align:center'>{img}<div style='font-size:12px; font-weight:bold; color:#333'>{escape(str(squadra))}</div></div>"
+
+def html_partite(partite):
+    cards = []
+    for casa, trasferta, risultato, pc, pt in zip(partite['Casa'], partite['Trasferta'], partite['Risultato'], partite['Punti_Casa'], partite['Punti_Trasferta']):
+        cards.append(
+            "<div style='flex:1 1 280px; display:flex; align-items:center; background:white; border:1px solid #ddd; border-radius:8px; padding:8px'>"
+            f"{html_squadra_card(casa)}"
+            "<div style='width:40%; text-align:center'>"
+            f"<div style='font-weight:bold; font-size:20px; color:#1f77b4'>{escape(str(risultato))}</div>"
+            f"<div style='font-size:14px; font-weight:bold; color:#ff8c00'>({pc} - {pt})</div></div>"
+            f"{html_squadra_card(trasferta)}</div>")
+    return f"<div style='display:flex; flex-wrap:wrap; gap:8px; margin-bottom:8px'>{''.join(cards)}</div>"
+
+def tabella_classifica(df_cl, col_squadra):
+    def colonna(nome, default=0):
+        return df_cl[nome].to_numpy() if nome in df_cl.columns else default
+    tabella = pd.DataFrame({'#': range(1, len(df_cl) + 1),
+                            'Logo': [logo_squadra(s) for s in df_cl[col_squadra]],
+                            'Squadra': df_cl[col_squadra].to_numpy()})
+    for col in ['G', 'V', 'N', 'P']:
+        tabella[col] = pd.to_numeric(pd.Series(colonna(col), index=tabella.index), errors='coerce').fillna(0).astype(int)
+    tabella['Pt.'] = colonna('Pt.')
+    tabella['Tot'] = colonna('Pt. Totali')
+    tabella['MV'] = colonna('Media_Voto', 0.0)
+    tabella['FM'] = colonna('Fanta_Media', 0.0)
+    return tabella
+
+def stile_classifica(tabella):
+    return (tabella.style
+            .map(lambda v: 'color:#d62728; font-weight:bold', subset=['Pt.'])
+            .map(lambda v: 'color:#1f77b4; font-weight:bold', subset=['Tot'])
+            .map(lambda v: 'color:green', subset=['MV'])
+            .map(lambda v: 'color:purple; font-weight:bold', subset=['FM'])
+            .format({'MV': '{:.2f}', 'FM': '{:.2f}'}, na_rep=''))
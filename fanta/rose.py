@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+from fanta.lettura import leggi_foglio
+from fanta.asset import trova_logo_seriea
+
+# --- IMPORTA ROSE ---
+# Ogni rosa e' un blocco: nome squadra, riga 'Ruolo | Calciatore | Squadra | Costo',
+# giocatori fino alla riga 'Crediti Residui' (o a una cella vuota). I blocchi possono
+# essere affiancati: si cercano tutte le celle 'Ruolo' del foglio con una maschera e
+# ogni blocco si ritaglia con iloc, nell'ordine colonna per colonna.
+COLONNE_ZERO = ['Media_Voto', 'Fanta_Media', 'Partite_Giocate', 'Gol_Totali', 'Gol_Subiti', 'Assist', 'Ammonizioni', 'Espulsioni', 'Rigori_Segnati', 'Rigori_Sbagliati', 'Rigori_Parati', 'Autoreti']
+
+def importa_rose(filepath):
+    df = leggi_foglio(filepath)
+    rows, cols = df.shape
+    testo = df.astype(str)
+    fine_blocco = (df.isna() | testo.apply(lambda c: c.str.startswith("Crediti"))).to_numpy()
+    blocchi = []
+    for c, r in np.argwhere((testo == 'Ruolo').to_numpy().T):
+        if r == 0 or c + 3 >= cols: continue
+        team = df.iat[r - 1, c]
+        if pd.isna(team): continue
+        stop = np.flatnonzero(fine_blocco[r + 1:, c])
+        fine = r + 1 + stop[0] if len(stop) else rows
+        blocco = df.iloc[r + 1:fine, c:c + 4]
+        blocco = blocco[blocco.iloc[:, 1].notna()]
+        blocchi.append((team, blocco.to_numpy()))
+    if not blocchi: return pd.DataFrame()
+
+    valori = np.concatenate([b for _, b in blocchi])
+    squadre = np.concatenate([[team] * len(b) for team, b in blocchi])
+    # Un logo per club, non per giocatore
+    codici, clubs = pd.factorize(valori[:, 2])
+    loghi = np.array([trova_logo_seriea(club) for club in clubs] + [None], dtype=object)
+    players = {'Giocatore': valori[:, 1].tolist(), 'Ruolo': valori[:, 0].tolist(), 'Squadra_SerieA': valori[:, 2].tolist(),
+               'Path_Logo': loghi[codici].tolist(), 'Fanta_Squadra': squadre.tolist(), 'Costo': valori[:, 3].tolist()}
+    for col in COLONNE_ZERO: players[col] = [0.0 if col in ('Media_Voto', 'Fanta_Media') else 0] * len(valori)
+    players['Status_Probabile'] = ['?'] * len(valori)
+    return pd.DataFrame(players)
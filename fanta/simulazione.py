@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+from fanta.nomi import nomi_voti, FILE_ALIAS_NOMI
+from fanta.ottimizzatore import ottimizza_formazioni, punteggio_proiezione
+from fanta.profilo import cronometrato
+
+# --- SIMULAZIONE DEL RESTO DELLA STAGIONE ---
+# Ogni squadra schiera la formazione consigliata; il fantavoto di ogni titolare e' estratto
+# dalle sue giornate nello storico (se non gioca entra un voto a caso della sua panchina).
+# I punteggi di squadra si estraggono una volta in un serbatoio per squadra, poi ogni
+# partita rimasta, in ogni simulazione, pesca dal serbatoio: tutto in NumPy, a blocchi
+# di simulazioni per contenere la memoria. Gol alla fantacalcio: 66 punti = 1 gol, poi
+# uno ogni 6. A parita' di punti conta il totale dei fantapunti.
+
+SOGLIA_GOL = 66
+PASSO_GOL = 6
+DIMENSIONE_SERBATOIO = 1 << 16
+BLOCCO_SIMULAZIONI = 10_000
+
+def gol_fantacalcio(punti):
+    return np.where(punti >= SOGLIA_GOL, (punti - SOGLIA_GOL) // PASSO_GOL + 1, 0)
+
+def punti_partita(gol_a, gol_b):
+    return np.where(gol_a > gol_b, 3, np.where(gol_a == gol_b, 1, 0))
+
+def classifica_attuale(partite, indice):
+    # Punti e fantapunti dalle partite gia' giocate del calendario
+    giocate = partite[partite['Giocata']]
+    punti = np.zeros(len(indice))
+    fantapunti = np.zeros(len(indice))
+    gol = giocate['Risultato'].astype(str).str.extract(r'(\d+)\s*-\s*(\d+)').astype(float).to_numpy()
+    for lato, col_punti, g_pro, g_contro in [('Casa', 'Punti_Casa', 0, 1), ('Trasferta', 'Punti_Trasferta', 1, 0)]:
+        squadra = giocate[lato].map(indice).to_numpy()
+        validi = ~pd.isna(squadra)
+        sq = squadra[validi].astype(int)
+        np.add.at(punti, sq, punti_partita(gol[validi, g_pro], gol[validi, g_contro]))
+        np.add.at(fantapunti, sq, giocate[col_punti].fillna(0).to_numpy()[validi])
+    return punti, fantapunti
+
+def serbatoio_squadra(rng, campioni_titolari, presenza, panchina, dimensione):
+    # Punteggi di squadra simulati: somma degli 11 titolari, ognuno dal proprio storico
+    totale = np.zeros(dimensione)
+    for campioni, p in zip(campioni_titolari, presenza):
+        gioca = rng.random(dimensione) < p if len(campioni) else np.zeros(dimensione, dtype=bool)
+        voto = campioni[rng.integers(0, len(campioni), dimensione)] if len(campioni) else 0.0
+        riserva = panchina[rng.integers(0, len(panchina), dimensione)] if len(panchina) else 0.0
+        totale += np.where(gioca, voto, riserva)
+    return totale
+
+def serbatoi(rng, squadre, df, storico, partite, dimensione, path_alias):
+    # Un serbatoio per squadra (righe nell'ordine di squadre); senza giocatori nello storico
+    # si ripescano i punteggi gia' fatti nel calendario
+    n_giornate = max(storico['Giornata'].nunique(), 1) if not storico.empty else 1
+    campioni = storico.groupby('clean_name')['Fantavoto'].apply(lambda s: s.to_numpy(dtype=float)).to_dict() if not storico.empty else {}
+    nomi = nomi_voti(df['Giocatore'], df.get('Squadra_SerieA', pd.Series("", index=df.index)), path_alias)
+    _, _, schieramento = ottimizza_formazioni(df, punteggio_proiezione(df))
+    vuoto = np.array([], dtype=float)
+    giocati = pd.concat([partite[['Casa', 'Punti_Casa']].set_axis(['Squadra', 'Punti'], axis=1),
+                         partite[['Trasferta', 'Punti_Trasferta']].set_axis(['Squadra', 'Punti'], axis=1)]).dropna()
+    risultato = np.full((len(squadre), dimensione), float(SOGLIA_GOL))
+    for i, squadra in enumerate(squadre):
+        rosa = df['Fanta_Squadra'] == squadra
+        titolari = nomi[rosa & (schieramento['Titolare'] == True)]
+        if len(titolari):
+            panchina = nomi[rosa & (schieramento['Titolare'] != True)]
+            voti_panchina = np.concatenate([campioni.get(n, vuoto) for n in panchina] + [vuoto])
+            titolari_campioni = [campioni.get(n, vuoto) for n in titolari]
+            presenza = [len(c) / n_giornate for c in titolari_campioni]
+            risultato[i] = serbatoio_squadra(rng, titolari_campioni, presenza, voti_panchina, dimensione)
+            continue
+        fatti = giocati.loc[giocati['Squadra'] == squadra, 'Punti'].to_numpy(dtype=float)
+        if len(fatti): risultato[i] = fatti[rng.integers(0, len(fatti), dimensione)]
+    return risultato
+
+def squadre_calendario(calendario):
+    if calendario is None: return []
+    partite = calendario['partite']
+    return sorted(set(partite['Casa'].dropna()) | set(partite['Trasferta'].dropna()))
+
+@cronometrato('simula_stagione')
+def simula_stagione(calendario, df, storico, simulazioni=100_000, seed=0, posti_top=4, posti_retrocessione=2, path_alias=FILE_ALIAS_NOMI):
+    # Probabilita' per squadra di titolo, primi posti_top e ultimi posti_retrocessione posti
+    partite = calendario['partite']
+    squadre = squadre_calendario(calendario)
+    indice = {s: i for i, s in enumerate(squadre)}
+    n = len(squadre)
+    # Posti in alto e in basso non possono sovrapporsi ne' superare le squadre
+    if posti_top < 1 or posti_retrocessione < 0 or posti_top + posti_retrocessione > n:
+        raise ValueError(f"Posti non validi per {n} squadre: {posti_top} in alto, {posti_retrocessione} in basso")
+    punti, fantapunti = classifica_attuale(partite, indice)
+    rimaste = partite[partite['Da_Giocare'] & partite['Casa'].isin(indice) & partite['Trasferta'].isin(indice)]
+    casa = rimaste['Casa'].map(indice).to_numpy(dtype=int)
+    trasferta = rimaste['Trasferta'].map(indice).to_numpy(dtype=int)
+    rng = np.random.default_rng(seed)
+    pool = serbatoi(rng, squadre, df, storico, partite, DIMENSIONE_SERBATOIO, path_alias)
+    # Matrici partita -> squadra per sommare punti e fantapunti con un prodotto
+    uno_casa = np.zeros((len(rimaste), n)); uno_casa[np.arange(len(rimaste)), casa] = 1
+    uno_trasferta = np.zeros((len(rimaste), n)); uno_trasferta[np.arange(len(rimaste)), trasferta] = 1
+
+    conteggi = np.zeros((n, n))
+    somma_punti = np.zeros(n)
+    for inizio in range(0, simulazioni, BLOCCO_SIMULAZIONI):
+        b = min(BLOCCO_SIMULAZIONI, simulazioni - inizio)
+        p_casa = pool[casa, rng.integers(0, DIMENSIONE_SERBATOIO, (b, len(rimaste)))]
+        p_trasferta = pool[trasferta, rng.integers(0, DIMENSIONE_SERBATOIO, (b, len(rimaste)))]
+        g_casa, g_trasferta = gol_fantacalcio(p_casa), gol_fantacalcio(p_trasferta)
+        finali = punti + punti_partita(g_casa, g_trasferta) @ uno_casa + punti_partita(g_trasferta, g_casa) @ uno_trasferta
+        totali = fantapunti + p_casa @ uno_casa + p_trasferta @ uno_trasferta
+        # Ordine per punti, poi fantapunti (sempre < 1e6): posizione 0 = primo
+        ordine = np.argsort(-(finali * 1e6 + totali), axis=1, kind='stable')
+        posizioni = np.empty_like(ordine)
+        posizioni[np.arange(b)[:, None], ordine] = np.arange(n)
+        conteggi += np.stack([np.bincount(posizioni[:, t], minlength=n) for t in range(n)])
+        somma_punti += finali.sum(axis=0)
+
+    prob = conteggi / max(simulazioni, 1)
+    esito = pd.DataFrame({
+        'Squadra': squadre, 'Punti': punti.astype(int), 'Punti_Attesi': somma_punti / max(simulazioni, 1),
+        'Posizione_Media': prob @ np.arange(1, n + 1),
+        'Titolo': prob[:, 0], 'Top': prob[:, :posti_top].sum(axis=1),
+        'Retrocessione': prob[:, n - posti_retrocessione:].sum(axis=1) if posti_retrocessione else 0.0,
+    })
+    esito.attrs['partite_rimaste'] = len(rimaste)
+    return esito.sort_values(['Posizione_Media', 'Squadra']).reset_index(drop=True)
@@ -0,0 +1,56 @@
+import os
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fanta.profilo import registra_cache
+from fanta.persistenza import percorso_atomico, firma_dati
+
+# --- STORICO GIORNATE (PARQUET INDICIZZATO) ---
+# Le righe sono ordinate per clean_name e Giornata; nei metadati del file c'e' l'indice
+# clean_name -> [prima riga, numero righe], cosi' la scheda di un giocatore legge solo
+# la sua fetta di tabella senza filtrare tutto lo storico.
+
+CHIAVE_INDICE = b'fanta_indice_giocatori'
+_tabelle_aperte = {}
+
+def salva_storico(df_hist, path):
+    df = df_hist.sort_values(['clean_name', 'Giornata'], kind='stable').reset_index(drop=True)
+    conteggi = df.groupby('clean_name', sort=False).size()
+    inizi = conteggi.cumsum() - conteggi
+    indice = {nome: [int(inizi[nome]), int(n)] for nome, n in conteggi.items()}
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadati = dict(table.schema.metadata or {})
+    metadati[CHIAVE_INDICE] = json.dumps(indice).encode('utf-8')
+    with percorso_atomico(path, versiona=True) as temporaneo: pq.write_table(table.replace_schema_metadata(metadati), temporaneo)
+
+def apri_storico(path):
+    # Tabella in memory-map + indice, ricaricati solo se il file e' stato riscritto
+    firma = firma_dati(path)
+    if firma is None: raise FileNotFoundError(path)
+    aperta = _tabelle_aperte.get(path)
+    registra_cache('storico', bool(aperta and aperta[0] == firma))
+    if aperta and aperta[0] == firma: return aperta[1], aperta[2]
+    table = pq.read_table(path, memory_map=True)
+    indice = json.loads(table.schema.metadata[CHIAVE_INDICE])
+    _tabelle_aperte[path] = (firma, table, indice)
+    return table, indice
+
+def storico_giocatore(path, clean_name):
+    table, indice = apri_storico(path)
+    pos = indice.get(clean_name)
+    if pos is None: return table.slice(0, 0).to_pandas()
+    return table.slice(pos[0], pos[1]).to_pandas()
+
+def leggi_storico(path):
+    return apri_storico(path)[0].to_pandas()
+
+def colonne_storico(path):
+    # Solo lo schema (insieme vuoto se il file manca)
+    try: return set(pq.read_schema(path).names)
+    except Exception: return set()
+
+def migra_storico_csv(path_csv, path):
+    if os.path.exists(path) or not os.path.exists(path_csv): return
+    try: salva_storico(pd.read_csv(path_csv), path)
+    except Exception: pass
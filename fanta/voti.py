@@ -0,0 +1,401 @@
+import os
+import re
+import glob
+import json
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fanta.nomi import normalizza_nomi, normalizza_club, risolvi_nomi, FILE_ALIAS_NOMI
+from fanta.lettura import leggi_excel_intelligente
+from fanta.database import check_database_integrity
+from fanta.storico import salva_storico, leggi_storico, colonne_storico
+from fanta.regole import fantavoti, REGOLA_STANDARD, PESI_STANDARD, COLONNE_STORICO
+from fanta.forma import aggiorna_forma, giornate_applicate
+from fanta.profilo import cronometrato, registra_cache
+from fanta.persistenza import percorso_atomico, scrivi_atomico
+
+DIR_CACHE_VOTI = os.path.join('.fanta_cache', 'voti')
+FILE_INDICE_CACHE_VOTI = os.path.join(DIR_CACHE_VOTI, 'indice.json')
+# Da incrementare quando cambia il formato dei dati salvati in cache
+VERSIONE_CACHE_VOTI = 3
+# Avviare un processo 'spawn' costa circa mezzo secondo (import di pandas), un file Voti
+# qualche centesimo: ogni processo deve avere almeno tanti file da ripagare l'avvio
+FILE_PER_PROCESSO = 100
+
+def estrai_numero_giornata(filepath):
+    nome_file = os.path.basename(filepath)
+    match = re.search(r'Giornata_(\d+)', nome_file)
+    if match: return int(match.group(1))
+    return 0
+
+# --- ANALISI SINGOLA GIORNATA ---
+# Funzione di modulo (e non dello script Streamlit) perche' i processi del pool
+# devono poterla importare.
+# Colonne lette dai file voti (la prima, con i club, viene sempre tenuta)
+COLONNE_VOTI = ['nome', 'calciatore', 'nome calciatore', 'voto', 'v', 'gf', 'gs', 'rp', 'rs', 'rf', 'au', 'amm', 'esp', 'ass']
+
+def analizza_giornata(filepath):
+    df_day = leggi_excel_intelligente(filepath, COLONNE_VOTI)
+    if df_day is None: return None
+    df_day.columns = df_day.columns.astype(str).str.lower().str.strip()
+    cols = df_day.columns
+    c_nome = next((c for c in cols if c in ['nome', 'calciatore', 'nome calciatore']), None)
+    c_voto = next((c for c in cols if c in ['voto', 'v']), None)
+    if not c_nome or not c_voto: return None
+    c_gf = next((c for c in cols if c == 'gf'), None)
+    c_gs = next((c for c in cols if c == 'gs'), None)
+    c_rp = next((c for c in cols if c == 'rp'), None)
+    c_rs = next((c for c in cols if c == 'rs'), None) 
+    c_rf = next((c for c in cols if c == 'rf'), None)
+    c_au = next((c for c in cols if c == 'au'), None)
+    c_amm = next((c for c in cols if c == 'amm'), None)
+    c_esp = next((c for c in cols if c == 'esp'), None)
+    c_ass = next((c for c in cols if c == 'ass'), None)
+    # Le righe con solo la prima cella piena sono il club dei giocatori che seguono
+    prima = df_day.columns[0]
+    marcatori = df_day[c_nome].isna() & df_day[prima].notna()
+    club = df_day[prima].where(marcatori).ffill().fillna(df_day.attrs.get('sopra_intestazione', ""))
+    df_day['squadra'] = club.map(normalizza_club)
+    df_day = df_day.dropna(subset=[c_nome])
+    df_day[c_voto] = pd.to_numeric(df_day[c_voto], errors='coerce')
+    validi = df_day[df_day[c_voto] > 0].copy()
+    validi['clean_name'] = normalizza_nomi(validi[c_nome])
+    def get_val(df_in, col_name):
+        if col_name: return pd.to_numeric(df_in[col_name], errors='coerce').fillna(0)
+        return 0
+    validi['gf'] = get_val(validi, c_gf)
+    validi['gs'] = get_val(validi, c_gs)
+    validi['rp'] = get_val(validi, c_rp)
+    validi['rs'] = get_val(validi, c_rs) 
+    validi['rf'] = get_val(validi, c_rf) 
+    validi['au'] = get_val(validi, c_au)
+    validi['amm'] = get_val(validi, c_amm)
+    validi['esp'] = get_val(validi, c_esp)
+    validi['ass'] = get_val(validi, c_ass)
+    validi['fantavoto'] = fantavoti(validi[c_voto], validi, {REGOLA_STANDARD: PESI_STANDARD})[REGOLA_STANDARD]
+    return validi[['clean_name', 'squadra', c_voto, 'fantavoto', 'gf', 'gs', 'rp', 'rs', 'rf', 'au', 'amm', 'esp', 'ass']].rename(columns={c_voto: 'voto'})
+
+# --- CACHE GIORNATE ---
+# Ogni file voti viene analizzato una sola volta: il risultato normalizzato e' salvato
+# in parquet e riusato finche' percorso, data di modifica e dimensione non cambiano.
+def carica_indice_cache_voti():
+    indice = {}
+    if os.path.exists(FILE_INDICE_CACHE_VOTI):
+        try:
+            with open(FILE_INDICE_CACHE_VOTI, encoding='utf-8') as f:
+                indice = json.load(f)
+        except: indice = {}
+    if indice.get('versione') != VERSIONE_CACHE_VOTI: indice = {}
+    indice.setdefault('file', {})
+    return indice
+
+def salva_indice_cache_voti(indice):
+    try:
+        indice['versione'] = VERSIONE_CACHE_VOTI
+        scrivi_atomico(FILE_INDICE_CACHE_VOTI, json.dumps(indice))
+    except OSError: pass
+
+def firma_file(filepath):
+    info = os.stat(filepath)
+    return [os.path.abspath(filepath), info.st_mtime_ns, info.st_size]
+
+def path_cache_giornata(filepath):
+    # Una sottocartella per cartella Voti: stagioni diverse con file omonimi non si sovrascrivono
+    cartella = hashlib.sha1(os.path.dirname(os.path.abspath(filepath)).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(DIR_CACHE_VOTI, cartella, os.path.splitext(os.path.basename(filepath))[0] + '.parquet')
+
+def leggi_giornata_da_cache(filepath, indice):
+    # Restituisce (trovato, mini): trovato e' False se il file va analizzato di nuovo
+    file_cache = path_cache_giornata(filepath)
+    voce = indice['file'].get(file_cache)
+    if not voce or voce['firma'] != firma_file(filepath): return False, None
+    try: return True, pd.read_parquet(file_cache)
+    except Exception: return False, None
+
+def salva_giornata_in_cache(filepath, indice, mini):
+    # I file illeggibili non vengono salvati: potrebbero essere aperti in Excel o a meta' copia
+    if mini is None: return
+    file_cache = path_cache_giornata(filepath)
+    try:
+        with percorso_atomico(file_cache) as temporaneo: mini.to_parquet(temporaneo)
+        indice['file'][file_cache] = {'firma': firma_file(filepath)}
+    except Exception: pass
+
+def pulisci_cache_voti(indice, files):
+    # Solo le voci delle stesse cartelle Voti: le altre stagioni restano in cache
+    attivi = {path_cache_giornata(f) for f in files}
+    cartelle = {os.path.dirname(f) for f in attivi}
+    for file_cache in [k for k in indice['file'] if os.path.dirname(k) in cartelle and k not in attivi]:
+        indice['file'].pop(file_cache)
+        if os.path.exists(file_cache): os.remove(file_cache)
+
+# --- ANALISI DI TUTTE LE GIORNATE ---
+def numero_processi_default():
+    return os.cpu_count() or 1
+
+def analizza_giornate(files, processi=None, progresso=None):
+    # Restituisce un mini per file (None se illeggibile) nello stesso ordine di files.
+    # I file non in cache vengono analizzati in parallelo se processi > 1 e sono abbastanza
+    # (FILE_PER_PROCESSO per processo), altrimenti in serie.
+    if processi is None: processi = numero_processi_default()
+    indice = carica_indice_cache_voti()
+    risultati = [None] * len(files)
+    da_analizzare = []
+    fatti = 0
+    for i, file in enumerate(files):
+        try: trovato, mini = leggi_giornata_da_cache(file, indice)
+        except OSError: trovato, mini = False, None
+        registra_cache('voti_giornate', trovato)
+        if not trovato:
+            da_analizzare.append(i)
+            continue
+        risultati[i] = mini
+        fatti += 1
+        if progresso: progresso(fatti, len(files))
+
+    def completa(i, mini):
+        nonlocal fatti
+        risultati[i] = mini
+        salva_giornata_in_cache(files[i], indice, mini)
+        fatti += 1
+        if progresso: progresso(fatti, len(files))
+
+    processi = min(processi, numero_processi_default(), len(da_analizzare) // FILE_PER_PROCESSO)
+    analizzati = set()
+    if processi > 1:
+        # 'spawn' come su Windows: il fork di un processo Streamlit (multi-thread) non e' sicuro.
+        # Se il pool si rompe (worker morto, avvio fallito) i file rimasti si fanno in serie.
+        try:
+            with ProcessPoolExecutor(max_workers=processi, mp_context=multiprocessing.get_context('spawn')) as pool:
+                futuri = {pool.submit(analizza_giornata, files[i]): i for i in da_analizzare}
+                for fut in as_completed(futuri):
+                    try: mini = fut.result()
+                    except BrokenProcessPool: raise
+                    except Exception: mini = None
+                    completa(futuri[fut], mini)
+                    analizzati.add(futuri[fut])
+        except BrokenProcessPool: pass
+    for i in da_analizzare:
+        if i in analizzati: continue
+        try: mini = analizza_giornata(files[i])
+        except Exception: mini = None
+        completa(i, mini)
+    pulisci_cache_voti(indice, files)
+    salva_indice_cache_voti(indice)
+    return risultati
+
+# --- STATISTICHE STAGIONALI ---
+# Colonna del database -> statistica aggregata per clean_name
+COLONNE_STATISTICHE = {
+    'Media_Voto': 'media_voto', 'Fanta_Media': 'fanta_media', 'Partite_Giocate': 'presenze',
+    'Gol_Totali': 'gf', 'Gol_Subiti': 'gs', 'Assist': 'ass', 'Ammonizioni': 'amm', 'Espulsioni': 'esp',
+    'Rigori_Segnati': 'rf', 'Rigori_Sbagliati': 'rs', 'Rigori_Parati': 'rp', 'Autoreti': 'au'
+}
+
+# Somme tenute nel corpus: le medie si ricavano da somme e presenze, cosi' una giornata
+# si puo' aggiungere o togliere senza rileggere le altre
+COLONNE_SOMME = ['somma_voto', 'somma_fantavoto', 'presenze', 'gf', 'gs', 'ass', 'amm', 'esp', 'rf', 'rs', 'rp', 'au']
+
+def chiavi_identita(df, omonimi):
+    return df['clean_name'].mask(df['clean_name'].isin(omonimi), df['clean_name'] + '|' + df['squadra'])
+
+def somme_per_chiave(df):
+    return df.groupby('chiave').agg(
+        clean_name=('clean_name', 'first'), squadra=('squadra', 'last'),
+        somma_voto=('voto', 'sum'), somma_fantavoto=('fantavoto', 'sum'), presenze=('voto', 'count'),
+        gf=('gf', 'sum'), gs=('gs', 'sum'), ass=('ass', 'sum'), amm=('amm', 'sum'), esp=('esp', 'sum'),
+        rf=('rf', 'sum'), rs=('rs', 'sum'), rp=('rp', 'sum'), au=('au', 'sum'))
+
+def con_medie(stats):
+    stats['media_voto'] = stats['somma_voto'] / stats['presenze']
+    stats['fanta_media'] = stats['somma_fantavoto'] / stats['presenze']
+    return stats
+
+def aggrega_giornate(giornate):
+    # Chiave = clean_name; solo per gli omonimi (stesso nome due volte nella stessa giornata)
+    # si aggiunge il club. Un giocatore che cambia squadra resta quindi una sola identita'.
+    big_df = pd.concat([g.assign(n_giornata=i) for i, g in enumerate(giornate)])
+    omonimi = big_df.loc[big_df.duplicated(['n_giornata', 'clean_name'], keep=False), 'clean_name']
+    big_df['chiave'] = chiavi_identita(big_df, omonimi)
+    return con_medie(somme_per_chiave(big_df))
+
+def unisci_statistiche(df_rose, stats, path_alias=FILE_ALIAS_NOMI):
+    # I giocatori senza voti mantengono i valori che avevano
+    clubs = df_rose['Squadra_SerieA'] if 'Squadra_SerieA' in df_rose.columns else pd.Series("", index=df_rose.index)
+    chiave = risolvi_nomi(df_rose['Giocatore'], clubs, stats, path_alias)
+    trovati = chiave.notna().to_numpy()
+    s = stats.loc[chiave[trovati]]
+    for col, c_stat in COLONNE_STATISTICHE.items():
+        valori = s[c_stat].to_numpy()
+        if c_stat in ('media_voto', 'fanta_media'): df_rose[col] = df_rose[col].astype(float)
+        else: valori = valori.astype(int)
+        df_rose.loc[trovati, col] = valori
+    return df_rose
+
+# --- ELABORA VOTI ---
+def elenca_file_voti(directory):
+    files = glob.glob(os.path.join(directory, "*Giornata*.xlsx"))
+    files.sort(key=estrai_numero_giornata)
+    return files
+
+GIORNATA_VUOTA = pd.DataFrame({'clean_name': pd.Series(dtype=object), 'Fantavoto': pd.Series(dtype=float)})
+
+def storico_giornata(mini, numero):
+    # Tutti i conteggi degli eventi: il fantavoto si puo' ricalcolare con altre regole
+    hist_mini = mini[['clean_name', 'voto', 'fantavoto', 'gf', 'ass', 'amm', 'esp', 'rp', 'rf', 'rs', 'gs', 'au']].copy()
+    hist_mini['Giornata'] = numero
+    return hist_mini.rename(columns={'voto': 'Voto', 'fantavoto': 'Fantavoto', **COLONNE_STORICO})
+
+def storico_completo(file_storico):
+    # Gli storici scritti prima delle regole configurabili non hanno tutti gli eventi
+    return set(COLONNE_STORICO.values()) <= colonne_storico(file_storico)
+
+# --- CORPUS VOTI DELLA STAGIONE ---
+# Statistiche aggregate e storico si calcolano una volta per stagione dai file Voti e sono
+# condivisi da tutte le leghe della stagione: aggiornare una lega e' solo l'unione con la
+# rosa. Le statistiche salvate portano la firma dei file voti da cui sono state calcolate.
+CHIAVE_FIRMA_CORPUS = b'fanta_firma_voti'
+
+def leggi_corpus(file_statistiche, files):
+    # Statistiche salvate se calcolate dagli stessi file voti, altrimenti None
+    if not file_statistiche or not os.path.exists(file_statistiche): return None
+    try:
+        table = pq.read_table(file_statistiche)
+        firma = json.loads(table.schema.metadata[CHIAVE_FIRMA_CORPUS])
+        if firma != [firma_file(f) for f in files]: return None
+        return table.to_pandas()
+    except Exception: return None
+
+def salva_corpus(stats, file_statistiche, files):
+    table = pa.Table.from_pandas(stats)
+    metadati = dict(table.schema.metadata or {})
+    metadati[CHIAVE_FIRMA_CORPUS] = json.dumps([firma_file(f) for f in files]).encode('utf-8')
+    with percorso_atomico(file_statistiche, versiona=True) as temporaneo: pq.write_table(table.replace_schema_metadata(metadati), temporaneo)
+
+@cronometrato('corpus_voti')
+def corpus_voti(directory, file_storico, file_statistiche=None, processi=None, progresso=None, file_forma=None):
+    # Statistiche per chiave di identita' (None se non ci sono voti leggibili); lo storico
+    # giornata per giornata e la vista di forma si aggiornano solo quando il corpus va ricalcolato
+    files = elenca_file_voti(directory)
+    stats = leggi_corpus(file_statistiche, files)
+    registra_cache('corpus_voti', stats is not None)
+    forma_aggiornata = not file_forma or giornate_applicate(file_forma) == [[estrai_numero_giornata(f), firma_file(f)] for f in files]
+    if stats is not None and storico_completo(file_storico) and forma_aggiornata: return stats
+    giornate = analizza_giornate(files, processi, progresso)
+    all_data = []
+    history_records = []
+    giornate_forma = []
+    for file, mini in zip(files, giornate):
+        # Un file illeggibile entra nella vista di forma come giornata senza voti: le giornate
+        # applicate restano uguali ai file e il corpus non si ricalcola a ogni rerun
+        if mini is None:
+            giornate_forma.append((estrai_numero_giornata(file), firma_file(file), GIORNATA_VUOTA))
+            continue
+        all_data.append(mini)
+        hist_mini = storico_giornata(mini, estrai_numero_giornata(file))
+        history_records.append(hist_mini)
+        giornate_forma.append((estrai_numero_giornata(file), firma_file(file), hist_mini))
+    if history_records: salva_storico(pd.concat(history_records), file_storico)
+    # Vista di forma: si applicano solo le giornate nuove
+    if file_forma and giornate_forma: aggiorna_forma(giornate_forma, file_forma)
+    if not all_data: return None
+    stats = aggrega_giornate(all_data)
+    if file_statistiche: salva_corpus(stats, file_statistiche, files)
+    return stats
+
+def applica_corpus(df_rose, stats, path_alias=FILE_ALIAS_NOMI):
+    if stats is None: return df_rose
+    df_rose = check_database_integrity(df_rose)
+    return unisci_statistiche(df_rose, stats, path_alias)
+
+@cronometrato('elabora_storico_voti')
+def elabora_storico_voti(df_rose, directory, file_storico, processi=None, progresso=None, file_statistiche=None, path_alias=FILE_ALIAS_NOMI, file_forma=None):
+    stats = corpus_voti(directory, file_storico, file_statistiche, processi, progresso, file_forma)
+    return applica_corpus(df_rose, stats, path_alias)
+
+# --- AGGIUNTA DI UNA GIORNATA ---
+# Caricare una giornata tocca solo i suoi giocatori: al corpus (somme per chiave) si toglie
+# il contributo della versione precedente della stessa giornata, se c'era, e si aggiunge
+# quello nuovo. Se cambiano gli omonimi (e quindi le chiavi) si ricalcola tutto.
+
+def giornata_analizzata(filepath, indice):
+    # mini della giornata dalla cache, altrimenti analizzando il file (None se illeggibile)
+    try: trovato, mini = leggi_giornata_da_cache(filepath, indice)
+    except OSError: trovato, mini = False, None
+    registra_cache('voti_giornate', trovato)
+    if trovato: return mini
+    try: mini = analizza_giornata(filepath)
+    except Exception: mini = None
+    salva_giornata_in_cache(filepath, indice, mini)
+    return mini
+
+def incrementa_corpus(stats, vecchi, nuovo, aggiorna_squadra):
+    # None se le chiavi d'identita' cambierebbero: serve il ricalcolo completo
+    if 'somma_voto' not in stats.columns: return None
+    if any(m['clean_name'].duplicated().any() for m in vecchi): return None
+    omonimi = set(stats.loc[stats.index != stats['clean_name'], 'clean_name'])
+    if nuovo is not None:
+        doppi = set(nuovo.loc[nuovo['clean_name'].duplicated(), 'clean_name'])
+        if doppi & set(stats.index): return None
+        omonimi |= doppi
+    stats = stats.copy()
+    for mini in vecchi:
+        togli = somme_per_chiave(mini.assign(chiave=chiavi_identita(mini, omonimi)))
+        if not togli.index.isin(stats.index).all(): return None
+        stats.loc[togli.index, COLONNE_SOMME] -= togli[COLONNE_SOMME]
+    if nuovo is not None:
+        aggiungi = somme_per_chiave(nuovo.assign(chiave=chiavi_identita(nuovo, omonimi)))
+        presenti = aggiungi.index.isin(stats.index)
+        stats.loc[aggiungi.index[presenti], COLONNE_SOMME] += aggiungi.loc[presenti, COLONNE_SOMME]
+        if aggiorna_squadra: stats.loc[aggiungi.index[presenti], 'squadra'] = aggiungi.loc[presenti, 'squadra']
+        stats = pd.concat([stats, con_medie(aggiungi[~presenti])])
+    return con_medie(stats[stats['presenze'] > 0])
+
+@cronometrato('aggiungi_giornata')
+def aggiungi_giornata(dati, nome_file, directory, file_storico, file_statistiche, file_forma=None):
+    # Scrive il file in directory e aggiorna corpus, storico e forma; restituisce
+    # (numero della giornata, statistiche, file della stessa giornata sostituiti).
+    # Le altre giornate non vengono rilette. Un file illeggibile non tocca i dati (ValueError).
+    numero = estrai_numero_giornata(nome_file)
+    if not numero: raise ValueError(f"Nel nome del file manca 'Giornata_N': {nome_file}")
+    files = elenca_file_voti(directory)
+    stats = leggi_corpus(file_statistiche, files)
+    indice = carica_indice_cache_voti()
+    precedenti = [f for f in files if estrai_numero_giornata(f) == numero]
+    vecchi = [giornata_analizzata(f, indice) for f in precedenti] if stats is not None else []
+    destinazione = os.path.join(directory, os.path.basename(nome_file))
+    # Si analizza il temporaneo (con l'estensione giusta per il lettore): il file diventa
+    # definitivo, e i vecchi della stessa giornata si tolgono, solo se e' leggibile
+    with percorso_atomico(destinazione, versiona=True, suffisso='.tmp' + os.path.splitext(destinazione)[1]) as temporaneo:
+        with open(temporaneo, 'wb') as f: f.write(dati)
+        try: nuovo = analizza_giornata(temporaneo)
+        except Exception: nuovo = None
+        if nuovo is None: raise ValueError(f"File voti illeggibile o senza voti: {os.path.basename(nome_file)}")
+    salva_giornata_in_cache(destinazione, indice, nuovo)
+    salva_indice_cache_voti(indice)
+    sostituiti = [os.path.basename(f) for f in precedenti if os.path.abspath(f) != os.path.abspath(destinazione)]
+    for f in precedenti:
+        if os.path.abspath(f) != os.path.abspath(destinazione): os.remove(f)
+    files = elenca_file_voti(directory)
+
+    ultima = max(estrai_numero_giornata(f) for f in files)
+    if stats is not None and storico_completo(file_storico):
+        stats = incrementa_corpus(stats, [m for m in vecchi if m is not None], nuovo, numero >= ultima)
+    else: stats = None
+    if stats is None:
+        # Corpus mancante o non allineato ai file: ricalcolo (le giornate sono in cache)
+        return numero, corpus_voti(directory, file_storico, file_statistiche, 1, None, file_forma), sostituiti
+
+    storico = leggi_storico(file_storico)
+    storico = storico[storico['Giornata'] != numero]
+    storico = pd.concat([storico, storico_giornata(nuovo, numero)], ignore_index=True)
+    salva_storico(storico, file_storico)
+    if file_forma:
+        righe = dict(list(storico.groupby('Giornata')))
+        aggiorna_forma([(estrai_numero_giornata(f), firma_file(f), righe.get(estrai_numero_giornata(f), GIORNATA_VUOTA)) for f in files], file_forma)
+    salva_corpus(stats, file_statistiche, files)
+    return numero, stats, sostituiti